@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Import-time benchmark for manus_mobile
+
+Measures a cold `import manus_mobile` (and optionally ADBClient creation
+plus a first tap on a connected device) in fresh interpreters, and exits
+with status 1 when the median exceeds the budget, so it can guard against
+startup regressions in CI.
+
+Usage:
+    python examples/import_benchmark.py [--runs 10] [--budget-ms 100] [--tap]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import manus_mobile
+print((time.perf_counter() - start) * 1000)
+"""
+
+TAP_SNIPPET = """
+import asyncio, os, time
+start = time.perf_counter()
+from manus_mobile import ADBClient, Coordinate
+client = ADBClient(adb_path=os.environ.get("ADB_PATH"))
+asyncio.run(client.tap(Coordinate(1, 1)))
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def measure(snippet: str, runs: int) -> list:
+    """Run snippet in fresh interpreters and collect the milliseconds it prints."""
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", snippet],
+            check=True, capture_output=True, text=True
+        )
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="fresh interpreters per measurement")
+    parser.add_argument("--budget-ms", type=float, default=100.0, help="maximum allowed median in milliseconds")
+    parser.add_argument("--tap", action="store_true", help="also measure import + ADBClient + first tap (needs a device)")
+    args = parser.parse_args()
+
+    measurements = [("import manus_mobile", IMPORT_SNIPPET)]
+    if args.tap:
+        measurements.append(("import + first tap", TAP_SNIPPET))
+
+    failed = False
+    for name, snippet in measurements:
+        timings = measure(snippet, args.runs)
+        median = statistics.median(timings)
+        status = "ok" if median <= args.budget_ms else "OVER BUDGET"
+        print(f"{name}: median {median:.1f} ms, min {min(timings):.1f} ms, max {max(timings):.1f} ms [{status}]")
+        failed = failed or median > args.budget_ms
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
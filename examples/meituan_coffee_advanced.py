@@ -48,9 +48,10 @@ async def get_device_info():
         
         # 获取设备详细信息
         device_info = {}
-        device_info["model"] = (await adb.shell("getprop ro.product.model"))["stdout"].strip()
-        device_info["android_version"] = (await adb.shell("getprop ro.build.version.release"))["stdout"].strip()
-        device_info["screen_size"] = await adb.screenSize()
+        info = await adb.deviceInfo()
+        device_info["model"] = info.model
+        device_info["android_version"] = info.android_version
+        device_info["screen_size"] = {"width": info.width, "height": info.height}
         
         return device_info
     except Exception as e:
@@ -3,21 +3,94 @@ manus_mobile - Python library for AI-driven mobile device automation
 """
 
 # Import typing classes
-from typing import List, Dict, Any, Optional, Callable
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Callable
+import importlib
+
+# Export main classes and functions. Submodules are imported on first
+# attribute access, so `import manus_mobile` stays cheap for short-lived
+# processes that only need part of the package.
+_LAZY_ATTRS = {
+    "ADBClient": ".adb_client",
+    "Coordinate": ".adb_client",
+    "ADBServerClient": ".adb_protocol",
+    "DeviceInfo": ".device_info",
+    "DevicePool": ".device_pool",
+    "Framebuffer": ".framebuffer",
+    "GestureEngine": ".gestures",
+    "ScreenStream": ".screen_stream",
+    "UITree": ".ui_tree",
+    "UINode": ".ui_tree",
+    "MobileAgent": ".agent",
+    "ContextManager": ".context",
+    "DecisionCache": ".llm_cache",
+    "TrajectoryRecorder": ".trajectory",
+    "TrajectoryReplayer": ".trajectory",
+    "mobile_use": ".core",
+    "MOBILE_USE_PROMPT": ".core",
+    "MobileToolProvider": ".tools",
+    "ClientRegistry": ".registry",
+    "get_registry": ".registry",
+    "create_mobile_computer": ".mobile_computer",
+    "MobileComputer": ".mobile_computer",
+    "LazyObservation": ".mobile_computer",
+}
+
+if TYPE_CHECKING:
+    from .adb_client import ADBClient, Coordinate
+    from .adb_protocol import ADBServerClient
+    from .device_info import DeviceInfo
+    from .device_pool import DevicePool
+    from .framebuffer import Framebuffer
+    from .gestures import GestureEngine
+    from .screen_stream import ScreenStream
+    from .ui_tree import UITree, UINode
+    from .agent import MobileAgent
+    from .context import ContextManager
+    from .llm_cache import DecisionCache
+    from .trajectory import TrajectoryRecorder, TrajectoryReplayer
+    from .core import mobile_use, MOBILE_USE_PROMPT
+    from .tools import MobileToolProvider
+    from .registry import ClientRegistry, get_registry
+    from .mobile_computer import create_mobile_computer, MobileComputer, LazyObservation
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    # Cache on the package so later lookups skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
 
-# Export main classes and functions
-from .adb_client import ADBClient, Coordinate
-from .core import mobile_use, MOBILE_USE_PROMPT
-from .tools import MobileToolProvider
-from .mobile_computer import create_mobile_computer, MobileComputer
 
 __version__ = "0.1.0"
 __all__ = [
-    "ADBClient", 
-    "Coordinate", 
-    "mobile_use", 
+    "ADBClient",
+    "Coordinate",
+    "ADBServerClient",
+    "DeviceInfo",
+    "DevicePool",
+    "Framebuffer",
+    "GestureEngine",
+    "ScreenStream",
+    "UITree",
+    "UINode",
+    "MobileAgent",
+    "ContextManager",
+    "DecisionCache",
+    "TrajectoryRecorder",
+    "TrajectoryReplayer",
+    "mobile_use",
     "MobileToolProvider",
+    "ClientRegistry",
+    "get_registry",
     "MOBILE_USE_PROMPT",
     "create_mobile_computer",
-    "MobileComputer"
-]
\ No newline at end of file
+    "MobileComputer",
+    "LazyObservation"
+]
@@ -2,8 +2,21 @@ import subprocess
 import json
 import base64
 import os
-from typing import Dict, List, Optional, Tuple, Union
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Tuple, Union
 import asyncio
+import time
+
+from .adb_protocol import ADBServerClient
+from .app_watcher import CONFIG_ORIENTATION, CONFIG_SCREEN_SIZE, ForegroundWatcher
+from .device_info import DeviceInfo, get_device_info, invalidate_device_info
+from .framebuffer import Framebuffer
+from .gestures import GestureEngine, double_tap_frames
+from .shell_session import ShellSession
+from .text_input import TextInput
+
+# UI parsing pulls in xml.etree; it is imported on first dump to keep startup fast
+if TYPE_CHECKING:
+    from .ui_tree import UITree
 
 class Coordinate:
     def __init__(self, x: int, y: int):
@@ -23,117 +36,320 @@ ANDROID_KEY_EVENTS = {
     "Home": "KEYCODE_HOME",
 }
 
+# adb binaries that already passed the `adb version` check
+_validated_adb_paths = set()
+
+# Printed after a batch with the number of finished steps and the exit code
+_BATCH_MARKER = "__MANUS_BATCH__"
+
 class ADBClient:
-    def __init__(self, adb_path: str = None):
+    def __init__(self, adb_path: str = None, persistent_shell: bool = False, server: Optional[ADBServerClient] = None, max_concurrency: int = 4, serial: Optional[str] = None, compress_ui_dump: bool = False):
         # Use provided adb_path or default to 'adb' command
         self.adb_path = adb_path or 'adb'
+        # Device this client is scoped to; None means adb's default device
+        self.serial = serial
+        # Keep one long-lived `adb shell` and multiplex commands over it
+        self.persistent_shell = persistent_shell
+        self._session: Optional[ShellSession] = None
+        # Talk to the adb server directly instead of running the adb binary
+        self.server = server
+        # Upper bound on in-flight commands for this device
+        self.max_concurrency = max_concurrency
+        self._slots: Optional[asyncio.Semaphore] = None
+        # gzip UI dumps on the device before transferring them
+        self.compress_ui_dump = compress_ui_dump
+        # Whether `uiautomator dump /dev/tty` works here; None until tried
+        self._dump_to_tty: Optional[bool] = None
+        # Raw touch event streaming, probed on first gesture
+        self._gestures: Optional[GestureEngine] = None
+        # Text entry method selection and throughput stats
+        self._text_input: Optional[TextInput] = None
+        # Event-driven foreground activity tracking, started on demand
+        self._app_watcher: Optional[ForegroundWatcher] = None
         
-        # Validate ADB is available
-        try:
-            subprocess.run([self.adb_path, "version"], check=True, capture_output=True)
-        except (subprocess.SubprocessError, FileNotFoundError):
-            raise RuntimeError(f"ADB is not available at path: {self.adb_path}. Please install Android SDK and set up ADB.")
-
-    def _execute_adb_command(self, command: str) -> subprocess.CompletedProcess:
-        """Execute an ADB command and return the completed process."""
-        full_command = f"{self.adb_path} {command}"
-        result = subprocess.run(
-            full_command, 
-            shell=True, 
-            capture_output=True, 
-            text=True
+        # Validate ADB is available (the server transport does not need the binary),
+        # once per adb path and process
+        if server is None and self.adb_path not in _validated_adb_paths:
+            try:
+                subprocess.run([self.adb_path, "version"], check=True, capture_output=True)
+            except (subprocess.SubprocessError, FileNotFoundError):
+                raise RuntimeError(f"ADB is not available at path: {self.adb_path}. Please install Android SDK and set up ADB.")
+            _validated_adb_paths.add(self.adb_path)
+
+    @property
+    def _device_slots(self) -> asyncio.Semaphore:
+        # Created lazily so the semaphore binds to the loop that uses it
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        return self._slots
+
+    @property
+    def _serial_args(self) -> List[str]:
+        return ["-s", self.serial] if self.serial else []
+
+    async def _execute_adb_command(self, *args: str, text: bool = True) -> subprocess.CompletedProcess:
+        """Execute an ADB command without blocking the event loop and return the completed process."""
+        args = (*self._serial_args, *args)
+        process = await asyncio.create_subprocess_exec(
+            self.adb_path, *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
         )
-        return result
+        try:
+            stdout, stderr = await process.communicate()
+        except BaseException:
+            # Cancelled (e.g. a prefetch that is no longer needed): do not leave adb running
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+        if text:
+            stdout = stdout.decode("utf-8", errors="replace")
+            stderr = stderr.decode("utf-8", errors="replace")
+        return subprocess.CompletedProcess([self.adb_path, *args], process.returncode, stdout, stderr)
 
-    def _shell(self, command: str) -> Dict[str, str]:
-        """Execute an ADB shell command."""
-        result = self._execute_adb_command(f"shell {command}")
+    async def _shell(self, command: str) -> Dict[str, str]:
+        """Execute an ADB shell command in a new adb process."""
+        result = await self._execute_adb_command("shell", command)
         return {
             "stdout": result.stdout,
-            "stderr": result.stderr
+            "stderr": result.stderr,
+            "exit_code": result.returncode
         }
 
-    async def screenshot(self) -> bytes:
-        """Take a screenshot of the device and return as bytes."""
-        # Execute the screenshot command and capture binary output directly
-        full_command = f"{self.adb_path} shell screencap -p"
-        process = await asyncio.create_subprocess_shell(
-            full_command,
+    async def _run_shell(self, command: str) -> Dict[str, str]:
+        """Execute an ADB shell command over the configured transport."""
+        async with self._device_slots:
+            if self.server is not None:
+                return await self.server.shell(self.serial, command)
+            if self.persistent_shell:
+                if self._session is None:
+                    self._session = ShellSession(self.adb_path, self._serial_args)
+                return await self._session.run(command)
+            return await self._shell(command)
+
+    @property
+    def app_watcher(self) -> ForegroundWatcher:
+        """Foreground activity watcher for this device; call start() to begin following it."""
+        if self._app_watcher is None:
+            self._app_watcher = ForegroundWatcher(self)
+            self._app_watcher.add_listener(self._on_device_event)
+        return self._app_watcher
+
+    def _on_device_event(self, event: str, data: Dict) -> None:
+        """Drop cached device properties that an event made stale."""
+        if event == "configuration" and data["changes"] & (CONFIG_ORIENTATION | CONFIG_SCREEN_SIZE):
+            invalidate_device_info(self.serial)
+
+    async def close(self, close_server: bool = True) -> None:
+        """
+        Release long-lived resources such as the persistent shell session.
+        
+        Args:
+            close_server: Also close the ADBServerClient; pass False when the
+                          server is shared with other clients
+        """
+        if self._app_watcher is not None:
+            await self._app_watcher.stop()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if close_server and self.server is not None:
+            await self.server.close()
+
+    async def _exec_out(self, command: str) -> bytes:
+        """Execute a command via exec-out and return its unmodified binary stdout."""
+        async with self._device_slots:
+            if self.server is not None:
+                return await self.server.exec_out(self.serial, command)
+            result = await self._execute_adb_command("exec-out", command, text=False)
+            return result.stdout
+
+    async def streamShell(self, command: str) -> AsyncIterator[str]:
+        """Run a long-lived command on the device and yield its output lines as they arrive."""
+        if self.server is not None:
+            async for line in self.server.stream_lines(self.serial, command):
+                yield line.decode("utf-8", errors="replace").rstrip("\r\n")
+            return
+        process = await asyncio.create_subprocess_exec(
+            self.adb_path, *self._serial_args, "exec-out", command,
             stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+            stderr=asyncio.subprocess.DEVNULL
         )
-        stdout, stderr = await process.communicate()
-        
-        # Return the raw binary data
-        return stdout
+        try:
+            async for line in process.stdout:
+                yield line.decode("utf-8", errors="replace").rstrip("\r\n")
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+    async def screenshot(self) -> bytes:
+        """Take a screenshot of the device and return as bytes."""
+        # exec-out avoids the pty, so binary PNG data is not CRLF-mangled
+        return await self._exec_out("screencap -p")
+
+    async def screenshotRaw(self) -> Framebuffer:
+        """Capture the raw framebuffer without on-device PNG encoding, stamped with the capture start."""
+        started = time.time()
+        raw = await self._exec_out("screencap")
+        return Framebuffer.from_screencap(raw, timestamp=started)
+
+    async def deviceInfo(self, refresh: bool = False) -> DeviceInfo:
+        """Get cached device properties, fetched in one shell call and refreshed after DEVICE_INFO_TTL."""
+        return await get_device_info(self, refresh)
 
     async def screenSize(self) -> Dict[str, int]:
         """Get the screen size of the device."""
-        result = self._shell("wm size")
-        stdout = result["stdout"]
-        match = next((line for line in stdout.split('\n') if "Physical size" in line), None)
-        
-        if not match:
-            raise RuntimeError("Failed to get screen size")
-            
-        # Extract dimensions using string operations
-        dimensions = match.split("Physical size:")[1].strip().split("x")
+        info = await self.deviceInfo()
         return {
-            "width": int(dimensions[0]),
-            "height": int(dimensions[1])
+            "width": info.width,
+            "height": info.height
         }
 
     async def shell(self, command: str) -> Dict[str, str]:
         """Execute a shell command on the device."""
-        return self._shell(command)
+        return await self._run_shell(command)
+
+    @property
+    def gestures(self) -> GestureEngine:
+        """Gesture engine streaming precomputed touch events to this device."""
+        if self._gestures is None:
+            self._gestures = GestureEngine(self)
+        return self._gestures
 
     async def doubleTap(self, coordinate: Coordinate) -> Dict[str, str]:
         """Double tap at the specified coordinate."""
-        self._shell(f"input tap {coordinate.x} {coordinate.y}")
-        return self._shell(f"input tap {coordinate.x} {coordinate.y}")
+        return await self.gestures.double_tap(coordinate.x, coordinate.y)
+
+    async def longPress(self, coordinate: Coordinate, duration: int = 800) -> Dict[str, str]:
+        """Press and hold at the specified coordinate."""
+        return await self.gestures.long_press(coordinate.x, coordinate.y, duration)
+
+    async def pinch(self, center: Coordinate, start_distance: int, end_distance: int, duration: int = 400) -> Dict[str, str]:
+        """Two-finger pinch around center; end_distance > start_distance zooms in."""
+        return await self.gestures.pinch((center.x, center.y), start_distance, end_distance, duration)
 
     async def tap(self, coordinate: Coordinate) -> Dict[str, str]:
         """Tap at the specified coordinate."""
-        return self._shell(f"input tap {coordinate.x} {coordinate.y}")
+        return await self._run_shell(_tap_command(coordinate))
 
     async def swipe(self, start: Coordinate, end: Coordinate, duration: int = 300) -> Dict[str, str]:
         """Swipe from start to end coordinates with specified duration."""
-        return self._shell(
-            f"input swipe {start.x} {start.y} {end.x} {end.y} {duration}"
-        )
+        return await self._run_shell(_swipe_command(start, end, duration))
+
+    @property
+    def text_input(self) -> TextInput:
+        """Text entry for this device, choosing input text or ADBKeyboard per string."""
+        if self._text_input is None:
+            self._text_input = TextInput(self)
+        return self._text_input
 
     async def type(self, text: str) -> Dict[str, str]:
         """Type the specified text."""
-        # Escape special characters in text
-        escaped_text = text.replace(' ', '\ ').replace('"', '\"')
-        return self._shell(f'input text "{escaped_text}"')
+        return await self.text_input.type(text)
 
     async def keyPress(self, key: str) -> Dict[str, str]:
         """Press the specified key."""
-        android_key = ANDROID_KEY_EVENTS.get(key)
-        if not android_key:
-            raise ValueError(f"Unsupported key: {key}")
+        return await self._run_shell(_key_command(key))
+
+    async def batch(self, actions: List[Dict]) -> Dict[str, str]:
+        """
+        Run several input actions in one device round trip.
         
-        return self._shell(f"input keyevent {android_key}")
+        Each action is a dictionary with the same keys as
+        MobileComputer.execute ("action", "coordinate", "start_coordinate",
+        "end_coordinate", "text", "duration") plus an optional "delay" in
+        milliseconds to wait after the step. Supported actions are tap,
+        double_tap, swipe, type, press and wait. The steps are compiled into
+        one shell script that stops at the first failing step; double taps
+        are written as raw touch events (see gestures) when the device
+        allows it.
+
+        Returns:
+            Dictionary with 'stdout', 'stderr', 'exit_code' of the failing
+            command (0 if all steps ran) and 'failed_step', the index of the
+            step that failed or None
+        """
+        steps = []
+        for i, step in enumerate(actions):
+            action = step.get("action")
+            if action == "tap" and step.get("coordinate"):
+                steps.append(_tap_command(Coordinate(*step["coordinate"])))
+            elif action == "double_tap" and step.get("coordinate"):
+                # Two `input tap` processes are too far apart to count as a double tap
+                script = await self.gestures.compile(double_tap_frames(tuple(step["coordinate"])))
+                command = _tap_command(Coordinate(*step["coordinate"]))
+                steps.append(script or f"{command} && {command}")
+            elif action == "swipe" and step.get("start_coordinate") and step.get("end_coordinate"):
+                steps.append(_swipe_command(
+                    Coordinate(*step["start_coordinate"]),
+                    Coordinate(*step["end_coordinate"]),
+                    step.get("duration") or 300
+                ))
+            elif action == "type" and step.get("text"):
+                steps.append(await self.text_input.command_for(step["text"]))
+            elif action == "press" and step.get("text"):
+                steps.append(_key_command(step["text"]))
+            elif action != "wait":
+                raise ValueError(f"Invalid batch step {i}: {step}")
+            
+            delay = step.get("delay") or (step.get("duration") if action == "wait" else None)
+            if delay:
+                steps.append(f"sleep {int(delay) / 1000:g}")
+            # Count finished steps so a failure can be traced to its step
+            steps.append(f"_done={i + 1}")
+        
+        if not actions:
+            return {"stdout": "", "stderr": "", "exit_code": 0, "failed_step": None}
+        script = (
+            f"_done=0; {' && '.join(steps)}; _rc=$?; "
+            f"printf '\\n{_BATCH_MARKER}:%d:%d\\n' \"$_done\" \"$_rc\""
+        )
+        result = await self._run_shell(script)
+        stdout, _, status = result["stdout"].rpartition(f"\n{_BATCH_MARKER}:")
+        done, _, exit_code = status.strip().partition(":")
+        if not done.isdigit() or not exit_code.isdigit():
+            raise RuntimeError(f"Batch did not report its progress: {result['stdout']!r} {result['stderr']!r}")
+        return {
+            "stdout": stdout,
+            "stderr": result["stderr"],
+            "exit_code": int(exit_code),
+            "failed_step": int(done) if int(exit_code) else None
+        }
 
     async def getDevices(self) -> List[str]:
         """Get a list of connected devices."""
-        result = self._execute_adb_command("devices")
-        devices = []
+        return list((await self.getDeviceStates()).keys())
+
+    async def getDeviceStates(self) -> Dict[str, str]:
+        """Get connected devices mapped to their state (device, offline, unauthorized...)."""
+        if self.server is not None:
+            return dict(await self.server.devices())
+
+        result = await self._execute_adb_command("devices")
+        devices = {}
         
-        # Parse the output to extract device IDs
+        # Parse the output to extract device IDs and states
         lines = result.stdout.strip().split('\n')
         if len(lines) > 1:  # Skip the first line (header)
             for line in lines[1:]:
                 if line.strip():
-                    device_id = line.split('\t')[0].strip()
-                    devices.append(device_id)
+                    device_id, _, state = line.partition('\t')
+                    devices[device_id.strip()] = state.strip()
                     
         return devices
         
     async def getCurrentApp(self) -> Dict:
         """Get the current foreground app information."""
-        result = self._shell("dumpsys window | grep -E 'mCurrentFocus|mFocusedApp'")
+        watcher = self._app_watcher
+        if watcher is not None and watcher.running and watcher.component:
+            return {
+                "currentFocus": watcher.component,
+                "focusedApp": watcher.component
+            }
+        
+        result = await self._run_shell("dumpsys window | grep -E 'mCurrentFocus|mFocusedApp'")
         
         current_focus = None
         focused_app = None
@@ -159,19 +375,18 @@ class ADBClient:
     async def listPackages(self, filter: Optional[str] = None) -> List[str]:
         """List installed packages, optionally filtered."""
         filter_arg = f" {filter}" if filter else ""
-        result = self._shell(f"pm list packages{filter_arg}")
+        result = await self._run_shell(f"pm list packages{filter_arg}")
         
         packages = [
             line.replace("package:", "").strip()
             for line in result["stdout"].split("\n")
             if line.strip().startswith("package:")
         ]
-        
         return packages
 
     async def openApp(self, packageName: str) -> Dict[str, str]:
         """Open an app using its package name."""
-        result = self._shell(f"monkey -p {packageName} 1")
+        result = await self._run_shell(f"monkey -p {packageName} 1")
         
         if result["stderr"] and "No activities found" in result["stderr"]:
             raise RuntimeError(f"Failed to open app: {result['stderr']}")
@@ -180,48 +395,72 @@ class ADBClient:
 
     async def dumpUI(self) -> str:
         """Dump the UI hierarchy and return as JSON."""
+        from .ui_dump_parser import parse_ui_dump
+
         try:
-            # Create the UI dump
-            self._shell("uiautomator dump")
-            
-            # Read the dump file
-            result = self._shell("cat /sdcard/window_dump.xml")
-            
-            # Clean up
-            self._shell("rm /sdcard/window_dump.xml")
-            
-            # Convert XML to simple dictionary structure
-            # In a real implementation, you'd need to parse XML properly
-            # For this example, we're returning a placeholder
-            xml_data = result["stdout"]
-            
-            # This would be replaced with proper XML parsing to JSON
-            # Since we don't have the ui_dump_parser module yet
-            parsed_data = self._simple_parse_ui(xml_data)
-            
-            return json.dumps(parsed_data)
+            xml_data = await self._dump_ui_xml()
+            return json.dumps(parse_ui_dump(xml_data))
         except Exception as e:
             raise RuntimeError(f"Failed to get UI hierarchy: {str(e)}")
     
-    def _simple_parse_ui(self, xml_data: str) -> Dict:
-        """
-        Simple placeholder parser that extracts basic info from UI dump XML.
-        In a real implementation, this would be more comprehensive.
-        """
-        # This is a simplified version - in reality you'd want a proper XML parser
-        elements = []
+    async def dumpUITree(self) -> "UITree":
+        """Dump the UI hierarchy into a compact array-backed UITree."""
+        from .ui_tree import UITree
+
+        try:
+            return UITree.from_xml(await self._dump_ui_xml())
+        except Exception as e:
+            raise RuntimeError(f"Failed to get UI hierarchy: {str(e)}")
+    
+    async def _dump_ui_xml(self) -> bytes:
+        """Dump the UI hierarchy XML in a single round trip."""
+        if not self.compress_ui_dump and not self.persistent_shell and self._dump_to_tty is not False:
+            # Stream the hierarchy straight back without touching storage
+            xml_data = _extract_hierarchy(await self._exec_out("uiautomator dump /dev/tty"))
+            if self._dump_to_tty is None:
+                # Devices that cannot dump to the tty never will; skip the attempt from now on
+                self._dump_to_tty = bool(xml_data)
+            if xml_data:
+                return xml_data
         
-        for line in xml_data.split("\n"):
-            if 'bounds="' in line:
-                # Extract some basic information
-                bounds = line.split('bounds="')[1].split('"')[0]
-                text = line.split('text="')[1].split('"')[0] if 'text="' in line else ""
-                resource_id = line.split('resource-id="')[1].split('"')[0] if 'resource-id="' in line else ""
-                
-                elements.append({
-                    "bounds": bounds,
-                    "text": text,
-                    "resource-id": resource_id
-                })
+        # Fall back to a private temp file so concurrent dumps never race
+        path = f"/data/local/tmp/manus_mobile_{os.urandom(16).hex()}.xml"
+        reader = "gzip -c" if self.compress_ui_dump else "cat"
+        command = f"uiautomator dump {path} >/dev/null && {reader} {path}; rm -f {path}"
+        if self.persistent_shell and not self.compress_ui_dump:
+            raw = (await self._run_shell(command))["stdout"].encode("utf-8")
+        else:
+            raw = await self._exec_out(command)
+            if self.compress_ui_dump:
+                import gzip
+
+                raw = gzip.decompress(raw)
         
-        return {"elements": elements} 
\ No newline at end of file
+        xml_data = _extract_hierarchy(raw)
+        if not xml_data:
+            raise RuntimeError("uiautomator returned no hierarchy")
+        return xml_data
+
+
+def _extract_hierarchy(raw: bytes) -> bytes:
+    """Cut the <hierarchy> document out of uiautomator output, dropping status lines."""
+    start = raw.find(b"<?xml")
+    if start == -1:
+        start = raw.find(b"<hierarchy")
+    end = raw.rfind(b"</hierarchy>")
+    if start == -1 or end == -1:
+        return b""
+    return raw[start:end + len(b"</hierarchy>")]
+
+
+def _tap_command(coordinate: Coordinate) -> str:
+    return f"input tap {coordinate.x} {coordinate.y}"
+
+def _swipe_command(start: Coordinate, end: Coordinate, duration: int) -> str:
+    return f"input swipe {start.x} {start.y} {end.x} {end.y} {duration}"
+
+def _key_command(key: str) -> str:
+    android_key = ANDROID_KEY_EVENTS.get(key)
+    if not android_key:
+        raise ValueError(f"Unsupported key: {key}")
+    return f"input keyevent {android_key}"
@@ -0,0 +1,311 @@
+"""
+Native asyncio client for the adb host protocol
+
+Talks to the local adb server (tcp:5037 by default) directly instead of
+running the ``adb`` binary, which removes fork/exec and host-side shell
+quoting from every device call.
+"""
+
+import asyncio
+import os
+import struct
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5037
+
+# Shell protocol v2 packet ids
+_SHELL_STDOUT = 1
+_SHELL_STDERR = 2
+_SHELL_EXIT = 3
+
+
+class ADBProtocolError(RuntimeError):
+    """Raised when the adb server rejects a request or the stream is malformed."""
+
+
+class ADBConnection:
+    """A single TCP connection to the adb server."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def open(cls, host: str, port: int) -> "ADBConnection":
+        """Open a new connection to the adb server."""
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError as e:
+            raise ADBProtocolError(f"Cannot connect to adb server at {host}:{port}: {e}")
+        return cls(reader, writer)
+
+    async def send(self, request: str) -> None:
+        """Send a host request and wait for OKAY."""
+        payload = request.encode("utf-8")
+        self.writer.write(b"%04x" % len(payload) + payload)
+        await self.writer.drain()
+        await self.read_status()
+
+    async def read_status(self) -> None:
+        """Consume an OKAY status, raising on FAIL."""
+        status = await self.read_exactly(4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            raise ADBProtocolError((await self.read_message()).decode("utf-8", errors="replace"))
+        raise ADBProtocolError(f"Unexpected adb server status: {status!r}")
+
+    async def read_message(self) -> bytes:
+        """Read a hex length-prefixed message."""
+        length = int(await self.read_exactly(4), 16)
+        return await self.read_exactly(length)
+
+    async def read_exactly(self, size: int) -> bytes:
+        try:
+            return await self.reader.readexactly(size)
+        except asyncio.IncompleteReadError as e:
+            raise ADBProtocolError(f"adb server closed the connection ({len(e.partial)}/{size} bytes read)")
+
+    async def read_all(self) -> bytes:
+        """Read until the server closes the stream."""
+        return await self.reader.read()
+
+    def close(self) -> None:
+        self.writer.close()
+
+    @property
+    def closed(self) -> bool:
+        return self.writer.is_closing() or self.reader.at_eof()
+
+
+class ADBServerClient:
+    """
+    Client for the adb server host protocol with a pool of connections.
+
+    Shell and exec services consume their connection (the server closes the
+    socket when the service ends), so for those the pool only bounds the
+    number of concurrent connections. ``sync:`` connections stay usable
+    after a request and are kept per device for reuse.
+    """
+
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None, max_connections: int = 16):
+        """
+        Initialize the client.
+
+        Args:
+            host: adb server host, defaults to 127.0.0.1
+            port: adb server port, defaults to $ANDROID_ADB_SERVER_PORT or 5037
+            max_connections: Maximum number of simultaneously open connections
+        """
+        self.host = host or DEFAULT_HOST
+        self.port = port or int(os.environ.get("ANDROID_ADB_SERVER_PORT", DEFAULT_PORT))
+        self.max_connections = max_connections
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._idle_sync: Dict[Optional[str], List[ADBConnection]] = {}
+        self._features: Dict[Optional[str], List[str]] = {}
+
+    @property
+    def _slots(self) -> asyncio.Semaphore:
+        # Created on first use: before Python 3.10 a Semaphore binds to the
+        # event loop current at construction, which may not be the one running
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+        return self._semaphore
+
+    async def _connect(self) -> ADBConnection:
+        return await ADBConnection.open(self.host, self.port)
+
+    async def _transport(self, serial: Optional[str], service: str) -> ADBConnection:
+        """Open a connection switched to the device transport and start a service."""
+        conn = await self._connect()
+        try:
+            await conn.send(f"host:transport:{serial}" if serial else "host:transport-any")
+            await conn.send(service)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    async def host_request(self, request: str) -> bytes:
+        """Send a host:* request and return its length-prefixed reply."""
+        async with self._slots:
+            conn = await self._connect()
+            try:
+                await conn.send(request)
+                return await conn.read_message()
+            finally:
+                conn.close()
+
+    async def devices(self) -> List[Tuple[str, str]]:
+        """List attached devices as (serial, state) pairs."""
+        data = (await self.host_request("host:devices")).decode("utf-8")
+        devices = []
+        for line in data.splitlines():
+            if line.strip():
+                serial, _, state = line.partition("\t")
+                devices.append((serial.strip(), state.strip()))
+        return devices
+
+    async def features(self, serial: Optional[str] = None) -> List[str]:
+        """
+        Return the feature list shared by the device and the server.
+
+        Successful answers are cached per serial; a failed query (device
+        still connecting, server restarting) returns an empty list without
+        being cached, so the next call asks again.
+        """
+        if serial not in self._features:
+            request = f"host-serial:{serial}:features" if serial else "host:features"
+            try:
+                data = await self.host_request(request)
+            except ADBProtocolError:
+                return []
+            self._features[serial] = data.decode("utf-8").split(",")
+        return self._features[serial]
+
+    async def shell(self, serial: Optional[str], command: str) -> Dict[str, str]:
+        """
+        Run a shell command on the device.
+
+        Uses shell protocol v2 when available so stdout, stderr and the exit
+        code come back separately; otherwise stderr is merged into stdout.
+
+        Args:
+            serial: Device serial, or None for the only attached device
+            command: Shell command line
+
+        Returns:
+            Dictionary with 'stdout', 'stderr' and 'exit_code'
+        """
+        if "shell_v2" not in await self.features(serial):
+            async with self._slots:
+                conn = await self._transport(serial, f"shell:{command}")
+                try:
+                    stdout = await conn.read_all()
+                finally:
+                    conn.close()
+            return {"stdout": stdout.decode("utf-8", errors="replace"), "stderr": "", "exit_code": None}
+
+        stdout, stderr = bytearray(), bytearray()
+        exit_code = None
+        async with self._slots:
+            conn = await self._transport(serial, f"shell,v2,raw:{command}")
+            try:
+                while exit_code is None:
+                    header = await self._read_packet_header(conn)
+                    if header is None:
+                        break
+                    packet_id, length = header
+                    data = await conn.read_exactly(length)
+                    if packet_id == _SHELL_STDOUT:
+                        stdout.extend(data)
+                    elif packet_id == _SHELL_STDERR:
+                        stderr.extend(data)
+                    elif packet_id == _SHELL_EXIT:
+                        exit_code = data[0] if data else 0
+            finally:
+                conn.close()
+        return {
+            "stdout": stdout.decode("utf-8", errors="replace"),
+            "stderr": stderr.decode("utf-8", errors="replace"),
+            "exit_code": exit_code
+        }
+
+    async def _read_packet_header(self, conn: ADBConnection) -> Optional[Tuple[int, int]]:
+        try:
+            header = await conn.reader.readexactly(5)
+        except asyncio.IncompleteReadError:
+            return None
+        packet_id, length = struct.unpack("<BI", header)
+        return packet_id, length
+
+    async def exec_out(self, serial: Optional[str], command: str) -> bytes:
+        """Run a command via exec: and return its raw, unmangled stdout."""
+        async with self._slots:
+            conn = await self._transport(serial, f"exec:{command}")
+            try:
+                return await conn.read_all()
+            finally:
+                conn.close()
+
+    async def stream_lines(self, serial: Optional[str], command: str) -> AsyncIterator[bytes]:
+        """
+        Run a long-lived command via exec: and yield its stdout line by line.
+
+        The connection does not take one of the shared slots, since it stays
+        open for as long as the caller keeps iterating.
+        """
+        conn = await self._transport(serial, f"exec:{command}")
+        try:
+            while True:
+                line = await conn.reader.readline()
+                if not line:
+                    return
+                yield line
+        finally:
+            conn.close()
+
+    async def pull(self, serial: Optional[str], path: str) -> bytes:
+        """Read a file from the device over the sync: service."""
+        async with self._slots:
+            conn = await self._acquire_sync(serial)
+            try:
+                encoded = path.encode("utf-8")
+                conn.writer.write(b"RECV" + struct.pack("<I", len(encoded)) + encoded)
+                await conn.writer.drain()
+                data = bytearray()
+                while True:
+                    response_id = await conn.read_exactly(4)
+                    length = struct.unpack("<I", await conn.read_exactly(4))[0]
+                    if response_id == b"DATA":
+                        data.extend(await conn.read_exactly(length))
+                    elif response_id == b"DONE":
+                        break
+                    elif response_id == b"FAIL":
+                        message = (await conn.read_exactly(length)).decode("utf-8", errors="replace")
+                        raise ADBProtocolError(f"Failed to pull {path}: {message}")
+                    else:
+                        raise ADBProtocolError(f"Unexpected sync response: {response_id!r}")
+            except BaseException:
+                conn.close()
+                raise
+            self._release_sync(serial, conn)
+            return bytes(data)
+
+    async def stat(self, serial: Optional[str], path: str) -> Dict[str, int]:
+        """Stat a file on the device over the sync: service."""
+        async with self._slots:
+            conn = await self._acquire_sync(serial)
+            try:
+                encoded = path.encode("utf-8")
+                conn.writer.write(b"STAT" + struct.pack("<I", len(encoded)) + encoded)
+                await conn.writer.drain()
+                if await conn.read_exactly(4) != b"STAT":
+                    raise ADBProtocolError("Unexpected sync response to STAT")
+                mode, size, mtime = struct.unpack("<III", await conn.read_exactly(12))
+            except BaseException:
+                conn.close()
+                raise
+            self._release_sync(serial, conn)
+            return {"mode": mode, "size": size, "mtime": mtime}
+
+    async def _acquire_sync(self, serial: Optional[str]) -> ADBConnection:
+        idle = self._idle_sync.get(serial, [])
+        while idle:
+            conn = idle.pop()
+            if not conn.closed:
+                return conn
+        return await self._transport(serial, "sync:")
+
+    def _release_sync(self, serial: Optional[str], conn: ADBConnection) -> None:
+        self._idle_sync.setdefault(serial, []).append(conn)
+
+    async def close(self) -> None:
+        """Close all pooled connections."""
+        for connections in self._idle_sync.values():
+            for conn in connections:
+                if not conn.closed:
+                    conn.writer.write(b"QUIT" + struct.pack("<I", 0))
+                conn.close()
+        self._idle_sync.clear()
@@ -0,0 +1,220 @@
+"""
+Multi-step agent loop that runs tool calls and feeds results back to the LLM
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .context import ContextManager, estimate_tokens
+from .mobile_computer import LazyObservation
+from .tools import MobileToolProvider
+
+# Seconds between checks whether prefetched observations are still valid
+PREFETCH_INTERVAL = 0.5
+
+
+def _field(value: Any, key: str) -> Any:
+    return value.get(key) if isinstance(value, dict) else getattr(value, key, None)
+
+
+def is_image(result: Any) -> bool:
+    """Whether a tool result is a screenshot ({'type': 'image/...', 'data': base64})."""
+    return isinstance(result, dict) and str(result.get("type", "")).startswith("image/") and "data" in result
+
+
+def image_part(result: Dict[str, str]) -> Dict[str, Any]:
+    """OpenAI-style image content part for a screenshot result."""
+    return {"type": "image_url", "image_url": {"url": f"data:{result['type']};base64,{result['data']}"}}
+
+
+def get_tool_calls(response: Any) -> List[Dict[str, Any]]:
+    """
+    Extract tool calls from an LLM response.
+
+    Accepts OpenAI-style dictionaries as well as provider objects with
+    ``tool_calls`` / ``function`` attributes.
+
+    Args:
+        response: The LLM response
+
+    Returns:
+        A list of {'id', 'name', 'arguments'} dictionaries, arguments decoded
+        (left as the raw string when they are not valid JSON)
+    """
+    result = []
+    for i, call in enumerate(_field(response, "tool_calls") or []):
+        function = _field(call, "function") or {}
+        arguments = _field(function, "arguments")
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments) if arguments.strip() else {}
+            except json.JSONDecodeError:
+                pass
+        result.append({
+            "id": _field(call, "id") or f"call_{i}",
+            "name": _field(function, "name"),
+            "arguments": {} if arguments is None else arguments
+        })
+    return result
+
+
+class MobileAgent:
+    """
+    Think-act loop over a MobileToolProvider.
+
+    Each step calls the LLM, runs the tool calls it returns through
+    ``execute_tool`` and appends the results as tool messages. While the LLM
+    is thinking, the current screen's UI dump and screenshot are prefetched
+    into the MobileComputer cache, so observation latency overlaps with
+    inference. The loop ends when the LLM answers without tool calls or
+    after max_steps LLM calls.
+
+    With a ContextManager, the messages sent to the LLM are a compacted copy
+    of the history that stays within its token budget. Every step records
+    the estimated prompt size in ``steps``.
+    """
+
+    def __init__(self, tool_provider: MobileToolProvider, llm_function: Callable, max_steps: int = 10, prefetch: bool = True, prefetch_screenshot: bool = True, context_manager: Optional[ContextManager] = None):
+        """
+        Initialize the agent.
+
+        Args:
+            tool_provider: Tools to expose to the LLM
+            llm_function: Async callable taking (messages, tools=...)
+            max_steps: Maximum number of LLM calls
+            prefetch: Prefetch observations while the LLM is thinking
+            prefetch_screenshot: Include a screenshot in the prefetch
+            context_manager: Compacts the history before each LLM call
+        """
+        self.tool_provider = tool_provider
+        self.llm_function = llm_function
+        self.max_steps = max_steps
+        self.prefetch = prefetch
+        self.prefetch_screenshot = prefetch_screenshot
+        self.context_manager = context_manager
+        self.messages: List[Dict[str, Any]] = []
+        self.steps: List[Dict[str, Any]] = []
+        self.prefetch_errors = 0
+
+    async def run(self, task: str, system_prompt: str) -> Any:
+        """
+        Run the loop for a task.
+
+        Args:
+            task: The user's task
+            system_prompt: The system prompt
+
+        Returns:
+            The last LLM response
+        """
+        self.messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": task}
+        ]
+        self.steps = []
+        tools = self.tool_provider.get_tools_for_llm()
+        response = None
+
+        for _ in range(self.max_steps):
+            started = time.perf_counter()
+            messages, step = self._prompt()
+            response = await self._think(messages, tools)
+            thought = time.perf_counter()
+            step["llm_seconds"] = thought - started
+            if response is None:
+                break
+
+            tool_calls = get_tool_calls(response)
+            if not tool_calls:
+                step.update(tool_seconds=0.0, tool_calls=0)
+                self.steps.append(step)
+                break
+
+            self.messages.append(self._assistant_message(response, tool_calls))
+            images = []
+            for call in tool_calls:
+                try:
+                    if not isinstance(call["arguments"], dict):
+                        raise ValueError(f"arguments must be a JSON object, got {call['arguments']!r}")
+                    result = await self.tool_provider.execute_tool(call["name"], **call["arguments"])
+                except (TypeError, ValueError) as e:
+                    result = f"Error: invalid arguments for {call['name']}: {e}"
+                if is_image(result):
+                    images.append(image_part(result))
+                    content = "Screenshot captured; the image follows."
+                else:
+                    content = await self._to_content(result)
+                self.messages.append({
+                    "role": "tool",
+                    "tool_call_id": call["id"],
+                    "name": call["name"],
+                    "content": content
+                })
+            if images:
+                # Tool messages are text-only, so images go in a user message after them
+                self.messages.append({
+                    "role": "user",
+                    "content": [{"type": "text", "text": "Screenshot of the current screen:"}] + images
+                })
+            step.update(tool_seconds=time.perf_counter() - thought, tool_calls=len(tool_calls))
+            self.steps.append(step)
+
+        return response
+
+    def _prompt(self) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Messages for the next LLM call and the step record measuring them."""
+        if self.context_manager is None:
+            return self.messages, {"prompt_tokens": estimate_tokens(self.messages)}
+        messages = self.context_manager.build(self.messages)
+        stats = self.context_manager.last_stats
+        return messages, {"prompt_tokens": stats["prompt_tokens"], "context": stats}
+
+    async def _think(self, messages: List[Dict[str, Any]], tools: List[Dict[str, Any]]) -> Any:
+        """Call the LLM, keeping the observation cache warm until it answers."""
+        computer = self.tool_provider.mobile_computer
+        if not self.prefetch or computer is None:
+            return await self.llm_function(messages, tools=tools)
+
+        warm = asyncio.ensure_future(self._keep_warm(computer))
+        try:
+            return await self.llm_function(messages, tools=tools)
+        finally:
+            # Do not hold up the next action for a capture it may not need
+            warm.cancel()
+            try:
+                await warm
+            except asyncio.CancelledError:
+                pass
+
+    async def _keep_warm(self, computer: Any) -> None:
+        """Prefetch, and prefetch again whenever a watcher event invalidated the result."""
+        while True:
+            try:
+                await computer.prefetch(screenshot=self.prefetch_screenshot)
+            except Exception:
+                self.prefetch_errors += 1
+                return
+            await asyncio.sleep(PREFETCH_INTERVAL)
+
+    def _assistant_message(self, response: Any, tool_calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "role": "assistant",
+            "content": _field(response, "content") or "",
+            "tool_calls": [
+                {
+                    "id": call["id"],
+                    "type": "function",
+                    "function": {"name": call["name"], "arguments": json.dumps(call["arguments"])}
+                }
+                for call in tool_calls
+            ]
+        }
+
+    async def _to_content(self, result: Any) -> str:
+        if isinstance(result, LazyObservation):
+            return await result.read()
+        if isinstance(result, str):
+            return result
+        return json.dumps(result)
@@ -0,0 +1,187 @@
+"""
+Event-driven tracking of the foreground activity
+"""
+
+import asyncio
+import re
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from .adb_client import ADBClient
+
+# Event log tags written when an activity is resumed (wm_* on Android 10+)
+RESUMED_TAGS = ("wm_set_resumed_activity", "am_set_resumed_activity")
+CONFIGURATION_TAG = "configuration_changed"
+
+# ActivityInfo.CONFIG_* bits that change the screen geometry
+CONFIG_ORIENTATION = 0x0080
+CONFIG_SCREEN_SIZE = 0x0400
+
+_COMPONENT_PATTERN = re.compile(r"([\w.]+)/([\w.$]+)")
+_EVENT_PATTERN = re.compile(r"^[VDIWEF]/(\w+)\s*(?:\(\s*\d+\))?:\s*(.*)$")
+
+
+class ForegroundWatcher:
+    """
+    Keep an always-current record of the foreground activity of a device.
+
+    A single long-lived stream seeds the state from ``dumpsys window`` once
+    and then follows resumed-activity and configuration events from the
+    ``events`` log buffer, so reading the foreground app costs nothing and
+    callers can await an activity instead of polling for it.
+    """
+
+    def __init__(self, adb_client: "ADBClient", reconnect_delay: float = 1.0):
+        """
+        Initialize the watcher.
+
+        Args:
+            adb_client: Client for the device to watch
+            reconnect_delay: Seconds to wait before restarting a stream that ended
+        """
+        self.adb_client = adb_client
+        self.reconnect_delay = reconnect_delay
+        self.package: Optional[str] = None
+        self.activity: Optional[str] = None
+        self.updated_at = 0.0
+        self.config_changes = 0
+        self.errors = 0
+        self._listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._changed: Optional[asyncio.Condition] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def component(self) -> Optional[str]:
+        """The foreground component as package/activity."""
+        if self.package is None:
+            return None
+        return f"{self.package}/{self.activity}"
+
+    def current(self) -> Dict[str, Any]:
+        """The foreground record: package, activity, component and update time."""
+        return {
+            "package": self.package,
+            "activity": self.activity,
+            "component": self.component,
+            "updated_at": self.updated_at
+        }
+
+    def add_listener(self, callback: Callable[[str, Dict[str, Any]], None]) -> None:
+        """
+        Call back on every event.
+
+        The callback gets the event name ("activity" or "configuration") and
+        a dictionary: the foreground record, or {"changes": mask} with the
+        changed ActivityInfo.CONFIG_* bits.
+        """
+        self._listeners.append(callback)
+
+    def start(self) -> None:
+        """Start following the device in a background task."""
+        if self.running:
+            return
+        self._changed = asyncio.Condition()
+        self._task = asyncio.ensure_future(self._follow())
+
+    async def stop(self) -> None:
+        """Stop following the device."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def _command(self) -> str:
+        filters = " ".join(f"{tag}:I" for tag in (*RESUMED_TAGS, CONFIGURATION_TAG))
+        # Events since just before the seed are replayed, so nothing is missed
+        # between dumpsys and logcat
+        return (
+            "t=$(date +%s); dumpsys window | grep -E 'mCurrentFocus|mFocusedApp'; "
+            f"exec logcat -b events -v tag -T \"$t.000\" {filters} '*:S'"
+        )
+
+    async def _follow(self) -> None:
+        while True:
+            try:
+                async for line in self.adb_client.streamShell(self._command()):
+                    await self._handle_line(line)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.errors += 1
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _handle_line(self, line: str) -> None:
+        event = _EVENT_PATTERN.match(line.strip())
+        if event is None:
+            # Seed lines from dumpsys; mFocusedApp is the app, mCurrentFocus may be a system window
+            if "mFocusedApp" in line or ("mCurrentFocus" in line and self.package is None):
+                match = _COMPONENT_PATTERN.search(line)
+                if match:
+                    await self._set_activity(match.group(1), match.group(2))
+            return
+
+        tag, message = event.groups()
+        if tag in RESUMED_TAGS:
+            match = _COMPONENT_PATTERN.search(message)
+            if match:
+                await self._set_activity(match.group(1), match.group(2))
+        elif tag == CONFIGURATION_TAG:
+            digits = message.strip("[] ")
+            self.config_changes += 1
+            self._notify("configuration", {"changes": int(digits) if digits.isdigit() else 0})
+
+    async def _set_activity(self, package: str, activity: str) -> None:
+        if activity.startswith("."):
+            activity = package + activity
+        self.package = package
+        self.activity = activity
+        self.updated_at = time.time()
+        self._notify("activity", self.current())
+        async with self._changed:
+            self._changed.notify_all()
+
+    def _notify(self, event: str, data: Dict[str, Any]) -> None:
+        for callback in self._listeners:
+            callback(event, data)
+
+    def matches(self, package: Optional[str] = None, activity: Optional[str] = None) -> bool:
+        """Whether the foreground app is the given package and/or activity (full or .Short name)."""
+        if self.package is None:
+            return False
+        if package is not None and self.package != package:
+            return False
+        if activity is not None:
+            full = self.package + activity if activity.startswith(".") else activity
+            return self.activity == full
+        return True
+
+    async def wait_for(self, package: Optional[str] = None, activity: Optional[str] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Wait until the given package and/or activity is in the foreground.
+
+        Args:
+            package: Package name to wait for
+            activity: Activity class name, fully qualified or starting with "."
+            timeout: Seconds to wait, or None to wait forever
+
+        Returns:
+            The foreground record
+        """
+        if not self.running:
+            raise RuntimeError("Foreground watcher is not running")
+
+        async def wait() -> Dict[str, Any]:
+            async with self._changed:
+                while not self.matches(package, activity):
+                    await self._changed.wait()
+                return self.current()
+
+        return await asyncio.wait_for(wait(), timeout)
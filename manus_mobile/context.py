@@ -0,0 +1,245 @@
+"""
+Compaction and token budgeting of the agent's message history
+"""
+
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .ui_dump_parser import flatten_ui_data
+
+# Rough characters per token for JSON-heavy prompts
+CHARS_PER_TOKEN = 4.0
+
+# Rough tokens per image content part (a phone screenshot at default detail)
+IMAGE_TOKENS = 1000
+
+
+def estimate_tokens(messages: List[Dict[str, Any]], chars_per_token: float = CHARS_PER_TOKEN) -> int:
+    """
+    Estimate the prompt size of a message list.
+
+    Counts the characters of every content string and tool-call argument,
+    plus IMAGE_TOKENS per image part; good enough to compare steps and to
+    enforce a budget without a tokenizer.
+
+    Args:
+        messages: OpenAI-style messages
+        chars_per_token: Characters assumed per token
+
+    Returns:
+        The estimated number of tokens
+    """
+    chars = 0
+    images = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            for part in content:
+                if isinstance(part, dict) and part.get("type") == "image_url":
+                    images += 1
+                else:
+                    chars += len(part.get("text") or "") if isinstance(part, dict) else len(str(part))
+        elif content is not None:
+            chars += len(json.dumps(content))
+        for call in message.get("tool_calls") or []:
+            function = call.get("function") or {}
+            chars += len(function.get("name") or "") + len(function.get("arguments") or "")
+    return int(chars / chars_per_token) + IMAGE_TOKENS * images + 4 * len(messages)
+
+
+def _observation_kind(content: Any) -> Tuple[Optional[str], Any]:
+    """Classify message content as 'ui', 'ui_diff' or 'screenshot' (or None) and return it parsed."""
+    if isinstance(content, list):
+        if any(isinstance(part, dict) and part.get("type") == "image_url" for part in content):
+            return "screenshot", content
+        return None, None
+    if not isinstance(content, str) or not content.startswith("{"):
+        return None, None
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return None, None
+    if not isinstance(data, dict):
+        return None, None
+    if data.get("type") == "ui_diff":
+        return "ui_diff", data
+    if str(data.get("type", "")).startswith("image/") and "data" in data:
+        return "screenshot", data
+    if "children" in data or "bounds" in data:
+        return "ui", data
+    return None, None
+
+
+class ContextManager:
+    """
+    Build the messages sent to the LLM from the agent's full history.
+
+    The history itself is never modified. In the copy sent to the model:
+
+    - the newest full UI hierarchy is kept verbatim together with the
+      ui_diffs after it (they are relative to it); older hierarchies become
+      a one-line summary of the screen and older diffs a count of what
+      changed,
+    - only the newest screenshot is kept, and only if no UI observation
+      came after it,
+    - if the estimate still exceeds max_tokens, the oldest steps are
+      dropped (keeping system prompt, task and the latest step) and listed
+      in a user message, and, as a last resort, the newest observation is
+      summarized too.
+
+    Statistics of the last build are in ``last_stats``.
+    """
+
+    def __init__(self, max_tokens: int = 32000, summary_texts: int = 12, chars_per_token: float = CHARS_PER_TOKEN):
+        """
+        Initialize the context manager.
+
+        Args:
+            max_tokens: Estimated prompt tokens allowed per LLM request
+            summary_texts: Visible texts listed in a screen summary
+            chars_per_token: Characters assumed per token
+        """
+        self.max_tokens = max_tokens
+        self.summary_texts = summary_texts
+        self.chars_per_token = chars_per_token
+        self.last_stats: Dict[str, Any] = {}
+        # id(content) -> [content, kind, summary] for tool results seen so
+        # far, so each observation is parsed and summarized only once
+        self._seen: Dict[int, List[Any]] = {}
+
+    def summarize(self, kind: str, data: Dict[str, Any]) -> str:
+        """One-line replacement for an observation that is no longer current."""
+        if kind == "screenshot":
+            return "[Earlier screenshot omitted]"
+        if kind == "ui_diff":
+            return (
+                f"[Earlier UI change: {len(data['changed'])} changed, "
+                f"{len(data['added'])} added, {len(data['removed'])} removed]"
+            )
+        nodes = flatten_ui_data(data)
+        package = next((node["package"] for node in nodes if node.get("package")), "unknown")
+        texts = []
+        for node in nodes:
+            label = node.get("text") or node.get("content-desc")
+            if label and label not in texts:
+                texts.append(label)
+                if len(texts) == self.summary_texts:
+                    break
+        visible = ", ".join(json.dumps(text, ensure_ascii=False) for text in texts)
+        return f"[Earlier screen of {package}, {len(nodes)} elements; texts: {visible}]"
+
+    def _classify(self, content: Any) -> List[Any]:
+        entry = self._seen.get(id(content))
+        if entry is None or entry[0] is not content:
+            kind, _ = _observation_kind(content)
+            entry = self._seen[id(content)] = [content, kind, None]
+        return entry
+
+    def _compact(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        entry = self._classify(message["content"])
+        if entry[2] is None:
+            content = entry[0]
+            entry[2] = self.summarize(entry[1], json.loads(content) if isinstance(content, str) else content)
+        return {**message, "content": entry[2]}
+
+    def estimate(self, messages: List[Dict[str, Any]]) -> int:
+        return estimate_tokens(messages, self.chars_per_token)
+
+    def build(self, history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Compact the history for the next LLM request.
+
+        Args:
+            history: The full message list (system, task, then assistant and
+                     tool messages)
+
+        Returns:
+            A new message list within the token budget where possible
+        """
+        started = time.perf_counter()
+        observations = {}
+        for position, message in enumerate(history):
+            # Tool results, and the user messages carrying screenshots after them
+            if message.get("role") == "tool" or (position > 1 and isinstance(message.get("content"), list)):
+                kind = self._classify(message.get("content"))[1]
+                if kind is not None:
+                    observations[position] = kind
+        latest_full = max((p for p, kind in observations.items() if kind == "ui"), default=-1)
+        diffs = [p for p, kind in observations.items() if kind == "ui_diff"]
+        if latest_full == -1:
+            # No full hierarchy to anchor them, so only the newest diff is worth keeping
+            diffs = diffs[-1:]
+        keep = {latest_full} | {p for p in diffs if p > latest_full}
+        latest_ui = max(keep)
+        latest_screenshot = max((p for p, kind in observations.items() if kind == "screenshot"), default=-1)
+        if latest_screenshot > latest_ui:
+            keep.add(latest_screenshot)
+
+        # (position in history, message) so later passes can find observations
+        entries = list(enumerate(history))
+        compacted = 0
+        for position in observations:
+            if position not in keep:
+                entries[position] = (position, self._compact(history[position]))
+                compacted += 1
+
+        tokens = self.estimate([message for _, message in entries])
+        dropped_steps = 0
+        if tokens > self.max_tokens:
+            entries, dropped_steps = self._drop_steps(entries)
+            tokens = self.estimate([message for _, message in entries])
+        if tokens > self.max_tokens:
+            for i, (position, message) in enumerate(entries):
+                if position in keep:
+                    entries[i] = (position, self._compact(message))
+                    compacted += 1
+            tokens = self.estimate([message for _, message in entries])
+
+        # Forget results that are no longer in the history (e.g. a new run)
+        live = {id(message.get("content")) for message in history}
+        self._seen = {key: entry for key, entry in self._seen.items() if key in live}
+
+        messages = [message for _, message in entries]
+        self.last_stats = {
+            "messages": len(messages),
+            "history_tokens": self.estimate(history),
+            "prompt_tokens": tokens,
+            "compacted": compacted,
+            "dropped_steps": dropped_steps,
+            "over_budget": tokens > self.max_tokens,
+            "build_seconds": time.perf_counter() - started
+        }
+        return messages
+
+    def _drop_steps(self, entries: List[Tuple[Optional[int], Dict[str, Any]]]) -> Tuple[List[Tuple[Optional[int], Dict[str, Any]]], int]:
+        """
+        Drop the oldest steps until the budget fits, keeping the latest.
+
+        A step is an assistant message together with the tool results and
+        screenshot messages that follow it, so a tool result is never kept
+        without its call. The actions of dropped steps are listed in a user
+        message placed between the task and the first kept step.
+        """
+        head = [entry for entry in entries[:2] if entry[1].get("role") in ("system", "user")]
+        steps: List[List[Tuple[Optional[int], Dict[str, Any]]]] = []
+        for entry in entries[len(head):]:
+            if entry[1].get("role") == "assistant" or not steps:
+                steps.append([])
+            steps[-1].append(entry)
+
+        dropped = 0
+        actions = []
+        while len(steps) > 1 and self.estimate([m for _, m in head] + [m for step in steps for _, m in step]) > self.max_tokens:
+            for _, message in steps.pop(0):
+                for call in message.get("tool_calls") or []:
+                    function = call.get("function") or {}
+                    actions.append(f"{function.get('name')}({function.get('arguments')})")
+            dropped += 1
+        if not dropped:
+            return entries, 0
+
+        note = {"role": "user", "content": f"[{dropped} earlier steps omitted; actions taken: {'; '.join(actions)}]"}
+        return head + [(None, note)] + [entry for step in steps for entry in step], dropped
@@ -3,15 +3,14 @@ Core functionality for manus_mobile
 """
 
 from typing import Dict, Any, Optional, Callable, List, Union
-import asyncio
 import os
-import sys
-import importlib.util
-from pathlib import Path
 
 from .adb_client import ADBClient
-from .mobile_computer import create_mobile_computer
-from .tools import MobileToolProvider
+from .agent import MobileAgent
+from .context import ContextManager
+from .llm_cache import DecisionCache
+from .device_pool import DevicePool
+from .registry import ClientRegistry, get_registry
 
 # Default system prompt for mobile automation
 MOBILE_USE_PROMPT = """You are an experienced mobile automation engineer. 
@@ -29,20 +28,24 @@ class LLMFunctionAdapter:
     Supports various LLM providers through a common interface.
     """
     
-    def __init__(self, model_name: str = "default"):
+    def __init__(self, model_name: str = "default", cache: Optional[DecisionCache] = None):
         """
         Initialize with a model name.
         
         Args:
             model_name: Name of the model to use, defaults to "default"
+            cache: Optional DecisionCache answering repeated requests without the LLM
         """
         self.model_name = model_name
+        self.cache = cache
         self.llm = None
         self.llm_config = None
-        self._load_minion()
+        # minion and its provider SDKs are imported on the first call
+        self._minion_loaded = False
         
     def _load_minion(self):
         """Load the minion library and configure LLM."""
+        self._minion_loaded = True
         try:
             # Import minion modules
             try:
@@ -137,6 +140,21 @@ class LLMFunctionAdapter:
             return tools
     
     async def __call__(self, messages: List[Dict[str, str]], tools: Optional[List[Dict[str, Any]]] = None) -> Dict[str, str]:
+        """
+        Call the LLM with the given messages and tools, through the cache if one is set.
+        
+        Args:
+            messages: List of message dictionaries with 'role' and 'content'
+            tools: Optional list of tool definitions
+            
+        Returns:
+            Response dictionary with 'role' and 'content'
+        """
+        if self.cache is not None:
+            return await self.cache.call(self._generate, messages, tools, namespace=self.model_name)
+        return await self._generate(messages, tools)
+    
+    async def _generate(self, messages: List[Dict[str, str]], tools: Optional[List[Dict[str, Any]]] = None) -> Dict[str, str]:
         """
         Call the LLM with the given messages and tools.
         
@@ -147,6 +165,8 @@ class LLMFunctionAdapter:
         Returns:
             Response dictionary with 'role' and 'content'
         """
+        if not self._minion_loaded:
+            self._load_minion()
         if not self.llm:
             return {
                 "role": "assistant",
@@ -158,13 +178,16 @@ class LLMFunctionAdapter:
             minion_messages = []
             for msg in messages:
                 # Create a dictionary of message attributes
-                msg_attrs = {"role": msg["role"], "content": msg["content"]}
+                msg_attrs = {"role": msg["role"], "content": msg.get("content") or ""}
                 
                 # Add additional attributes if present
                 if "name" in msg:
                     msg_attrs["name"] = msg["name"]
                 if "tool_call_id" in msg:
                     msg_attrs["tool_call_id"] = msg["tool_call_id"]
+                # Pass the agent loop's tool calls through so tool results stay paired
+                if msg.get("tool_calls"):
+                    msg_attrs["tool_calls"] = msg["tool_calls"]
                 
                 # Create minion Message object
                 minion_messages.append(self.Message(**msg_attrs))
@@ -184,6 +207,16 @@ class LLMFunctionAdapter:
                 print(f"LLM response type: {type(response)}")
                 print(f"LLM response: {response}")
                 
+                # Keep tool calls even when the response also has content
+                tool_calls = response.get("tool_calls") if isinstance(response, dict) else getattr(response, "tool_calls", None)
+                if tool_calls:
+                    content = response.get("content") if isinstance(response, dict) else getattr(response, "content", None)
+                    return {
+                        "role": "assistant",
+                        "content": content or "",
+                        "tool_calls": tool_calls if isinstance(tool_calls, list) else [tool_calls]
+                    }
+                
                 # Return properly formatted response
                 if response is None:
                     print("Warning: LLM returned None response")
@@ -244,7 +277,13 @@ class LLMFunctionAdapter:
 async def mobile_use(
     task: str, 
     model_or_function: Union[str, Callable, None] = "default", 
-    system_prompt: Optional[str] = None
+    system_prompt: Optional[str] = None,
+    serial: Optional[str] = None,
+    device_pool: Optional[DevicePool] = None,
+    registry: Optional[ClientRegistry] = None,
+    max_steps: int = 1,
+    decision_cache: Optional[DecisionCache] = None,
+    context_manager: Optional[ContextManager] = None
 ) -> Dict[str, Any]:
     """
     Use AI to automate mobile device interactions.
@@ -254,69 +293,33 @@ async def mobile_use(
         model_or_function: Either a model name string (e.g., "gpt-4o", "default"),
                            or a callable LLM function. If None, no LLM call is made.
         system_prompt: Optional custom system prompt
+        serial: Serial of the device to use when several are attached
+        device_pool: Optional DevicePool to lease an idle device from;
+                     takes precedence over serial
+        registry: Registry of warm clients and adapters to reuse across
+                  tasks, defaults to the process-wide one
+        max_steps: Maximum number of LLM calls. With 1 the single response is
+                   returned as is; with more, tool calls are executed and fed
+                   back to the model until it answers without tool calls
+        decision_cache: Optional DecisionCache that replays stored tool calls
+                        for repeated task/screen combinations
+        context_manager: Optional ContextManager that compacts the message
+                         history between steps (with max_steps > 1)
         
     Returns:
         The result of the AI-driven mobile automation
     """
-    # Initialize the ADB client with potential custom path
-    adb_path = os.environ.get('ADB_PATH')
-    adb_client = ADBClient(adb_path=adb_path)
+    registry = registry or get_registry()
+    if device_pool is None:
+        # Reuse the ADB client for this device, with potential custom path
+        adb_path = os.environ.get('ADB_PATH')
+        adb_client = registry.client(adb_path=adb_path, serial=serial)
     
     try:
-        # Create the mobile computer tool
-        computer = await create_mobile_computer(adb_client)
-        
-        # Create the tool provider with the mobile computer
-        tool_provider = MobileToolProvider(adb_client, computer)
-        
-        # Use the provided system prompt or the default
-        system_prompt = system_prompt or MOBILE_USE_PROMPT
-        
-        # Generate messages for the LLM
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": task}
-        ]
-        
-        # 获取工具 - 确保工具符合minion的FunctionDefinition格式
-        try:
-            from minion.schema.message_types import FunctionDefinition
-            tools = tool_provider.get_tools_for_llm()
-            # 打印工具信息以进行调试
-            print(f"Tools structure: {tools}")
-        except Exception as e:
-            print(f"Error getting tools: {e}")
-            tools = []
-        
-        # Handle different types of model_or_function
-        llm_function = None
-        
-        if isinstance(model_or_function, str):
-            # Create adapter with the specified model
-            llm_function = LLMFunctionAdapter(model_name=model_or_function)
-        elif callable(model_or_function):
-            # Use the provided function directly
-            llm_function = model_or_function
-        
-        # If we have a valid LLM function, use it
-        if llm_function:
-            # Call the LLM function with messages and tools
-            response = await llm_function(messages, tools=tools)
-            
-            # 检查响应是否为None或内容为None
-            if response is None:
-                return {
-                    "role": "assistant",
-                    "content": "None"
-                }
-            
-            return response
-        else:
-            # Return a message that an LLM function is required
-            return {
-                "role": "assistant",
-                "content": "To use manus_mobile, you need to provide a valid model name or LLM function."
-            }
+        if device_pool is not None:
+            async with device_pool.lease() as leased_client:
+                return await _run_task(leased_client, task, model_or_function, system_prompt, registry, max_steps, decision_cache, context_manager)
+        return await _run_task(adb_client, task, model_or_function, system_prompt, registry, max_steps, decision_cache, context_manager)
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -324,4 +327,78 @@ async def mobile_use(
         return {
             "role": "assistant",
             "content": f"Error: {str(e)}"
-        } 
\ No newline at end of file
+        } 
+
+
+async def _run_task(
+    adb_client: ADBClient,
+    task: str,
+    model_or_function: Union[str, Callable, None],
+    system_prompt: Optional[str],
+    registry: ClientRegistry,
+    max_steps: int = 1,
+    decision_cache: Optional[DecisionCache] = None,
+    context_manager: Optional[ContextManager] = None
+) -> Dict[str, Any]:
+    """Run a single mobile_use task on the given device client."""
+    # Reuse the device's tool provider and mobile computer
+    tool_provider = await registry.tool_provider(adb_client)
+    # The screen may have changed since the previous task on this device
+    tool_provider.mobile_computer.invalidate_ui_cache()
+    
+    # Use the provided system prompt or the default
+    system_prompt = system_prompt or MOBILE_USE_PROMPT
+    
+    # Generate messages for the LLM
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": task}
+    ]
+    
+    # 获取工具
+    try:
+        tools = tool_provider.get_tools_for_llm()
+        # 打印工具信息以进行调试
+        print(f"Tools structure: {tools}")
+    except Exception as e:
+        print(f"Error getting tools: {e}")
+        tools = []
+    
+    # Handle different types of model_or_function
+    llm_function = None
+    
+    if isinstance(model_or_function, str):
+        # Reuse the adapter for the specified model
+        llm_function = registry.llm_adapter(model_or_function)
+    elif callable(model_or_function):
+        # Use the provided function directly
+        llm_function = model_or_function
+    
+    if llm_function and decision_cache is not None:
+        namespace = model_or_function if isinstance(model_or_function, str) else getattr(model_or_function, "__qualname__", "")
+        llm_function = decision_cache.wrap(llm_function, namespace=namespace)
+    
+    # If we have a valid LLM function, use it
+    if llm_function:
+        if max_steps > 1:
+            # Run tool calls and feed the results back to the model
+            agent = MobileAgent(tool_provider, llm_function, max_steps=max_steps, context_manager=context_manager)
+            response = await agent.run(task, system_prompt)
+        else:
+            # Call the LLM function with messages and tools
+            response = await llm_function(messages, tools=tools)
+        
+        # 检查响应是否为None或内容为None
+        if response is None:
+            return {
+                "role": "assistant",
+                "content": "None"
+            }
+        
+        return response
+    else:
+        # Return a message that an LLM function is required
+        return {
+            "role": "assistant",
+            "content": "To use manus_mobile, you need to provide a valid model name or LLM function."
+        }
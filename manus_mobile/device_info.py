@@ -0,0 +1,139 @@
+"""
+Process-wide cache of per-device properties
+"""
+
+import re
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from .adb_client import ADBClient
+
+# Section markers and commands of the batched query
+_SECTIONS = (
+    ("size", "wm size"),
+    ("density", "wm density"),
+    ("orientation", "dumpsys input | grep -m 1 SurfaceOrientation"),
+    ("model", "getprop ro.product.model"),
+    ("android_version", "getprop ro.build.version.release"),
+    ("sdk", "getprop ro.build.version.sdk"),
+)
+_MARKER = "@@manus_mobile:"
+
+_SIZE_PATTERN = re.compile(r"Physical size:\s*(\d+)x(\d+)")
+_DENSITY_PATTERN = re.compile(r"Physical density:\s*(\d+)")
+_DIGITS_PATTERN = re.compile(r"(\d+)")
+
+
+class DeviceInfo:
+    """Screen size, density, orientation, model and SDK of one device."""
+
+    def __init__(self, serial: Optional[str], width: int, height: int, density: Optional[int], orientation: Optional[int], model: str, android_version: str, sdk: Optional[int]):
+        self.serial = serial
+        self.width = width
+        self.height = height
+        self.density = density
+        self.orientation = orientation
+        self.model = model
+        self.android_version = android_version
+        self.sdk = sdk
+        self.fetched_at = time.time()
+
+    @classmethod
+    def parse(cls, serial: Optional[str], output: str) -> "DeviceInfo":
+        """
+        Parse the output of the batched query.
+
+        Args:
+            serial: Serial of the device queried
+            output: stdout of the batched shell command
+
+        Returns:
+            The parsed DeviceInfo
+        """
+        sections: Dict[str, List[str]] = {}
+        current = None
+        for line in output.splitlines():
+            if line.startswith(_MARKER):
+                current = line[len(_MARKER):].strip()
+                sections[current] = []
+            elif current is not None:
+                sections[current].append(line)
+
+        def text(name: str) -> str:
+            return "\n".join(sections.get(name, [])).strip()
+
+        def number(pattern: "re.Pattern", name: str) -> Optional[int]:
+            match = pattern.search(text(name))
+            return int(match.group(1)) if match else None
+
+        size = _SIZE_PATTERN.search(text("size"))
+        if not size:
+            raise RuntimeError("Failed to get screen size")
+        return cls(
+            serial,
+            int(size.group(1)),
+            int(size.group(2)),
+            number(_DENSITY_PATTERN, "density"),
+            number(_DIGITS_PATTERN, "orientation"),
+            text("model"),
+            text("android_version"),
+            number(_DIGITS_PATTERN, "sdk")
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "serial": self.serial,
+            "width": self.width,
+            "height": self.height,
+            "density": self.density,
+            "orientation": self.orientation,
+            "model": self.model,
+            "android_version": self.android_version,
+            "sdk": self.sdk,
+        }
+
+
+def batched_query() -> str:
+    """The single shell command that collects every DeviceInfo field."""
+    return "; ".join(f"echo '{_MARKER}{name}'; {command}" for name, command in _SECTIONS)
+
+
+# Cached DeviceInfo per serial ("" for adb's default device)
+_cache: Dict[str, DeviceInfo] = {}
+
+# Seconds a cached entry is used before the device is queried again; bounds
+# staleness (`wm size` overrides, rotation) when no watcher runs
+DEVICE_INFO_TTL = 60.0
+
+
+async def get_device_info(adb_client: "ADBClient", refresh: bool = False, max_age: Optional[float] = DEVICE_INFO_TTL) -> DeviceInfo:
+    """
+    Return the cached DeviceInfo for the client's device, querying it if needed.
+
+    Args:
+        adb_client: Client for the device
+        refresh: Ignore the cached entry and query the device again
+        max_age: Seconds a cached entry stays valid, or None for no expiry
+
+    Returns:
+        The device's DeviceInfo
+    """
+    key = adb_client.serial or ""
+    info = _cache.get(key)
+    if info is not None and not refresh and (max_age is None or time.time() - info.fetched_at <= max_age):
+        return info
+    result = await adb_client.shell(batched_query())
+    info = DeviceInfo.parse(adb_client.serial, result["stdout"])
+    _cache[key] = info
+    return info
+
+
+def cached_device_info(serial: Optional[str] = None) -> Optional[DeviceInfo]:
+    """The cached DeviceInfo for a serial, without querying the device."""
+    return _cache.get(serial or "")
+
+
+def invalidate_device_info(serial: Optional[str] = None) -> None:
+    """Drop the cached DeviceInfo for a serial so the next access queries the device."""
+    _cache.pop(serial or "", None)
@@ -0,0 +1,214 @@
+"""
+Device pool for running automation tasks across many attached devices
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from .adb_client import ADBClient
+from .adb_protocol import ADBServerClient
+
+
+class DeviceSlot:
+    """Book-keeping for one device in the pool."""
+
+    def __init__(self, client: ADBClient):
+        self.client = client
+        self.load = 0
+        self.failures = 0
+        self.completed = 0
+        self.last_used = 0.0
+        self.unhealthy_until = 0.0
+
+    @property
+    def serial(self) -> str:
+        return self.client.serial
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.unhealthy_until
+
+
+class DevicePool:
+    """
+    Lease serial-scoped ADBClients to concurrent tasks.
+
+    Idle devices are handed out by health first (fewest consecutive
+    failures), then by current load, then least recently used. A device
+    that fails ``max_failures`` times in a row is benched for
+    ``cooldown`` seconds before it is leased again.
+    """
+
+    def __init__(self,
+                 adb_path: Optional[str] = None,
+                 serials: Optional[List[str]] = None,
+                 server: Optional[ADBServerClient] = None,
+                 max_tasks_per_device: int = 1,
+                 max_failures: int = 3,
+                 cooldown: float = 60.0,
+                 **client_options: Any):
+        """
+        Initialize the pool.
+
+        Args:
+            adb_path: Path to the adb binary
+            serials: Devices to use; discovered with ``adb devices`` when None
+            server: Optional adb server client shared by all device clients
+            max_tasks_per_device: Concurrent leases allowed per device
+            max_failures: Consecutive failures before a device is benched
+            cooldown: Seconds a benched device is kept out of rotation
+            client_options: Extra keyword arguments for each ADBClient
+        """
+        self.adb_path = adb_path
+        self.server = server
+        self.max_tasks_per_device = max_tasks_per_device
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.client_options = client_options
+        self._serials = serials
+        self._slots: Dict[str, DeviceSlot] = {}
+        self._changed: Optional[asyncio.Condition] = None
+
+    @property
+    def _condition(self) -> asyncio.Condition:
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        return self._changed
+
+    def _create_client(self, serial: Optional[str]) -> ADBClient:
+        return ADBClient(adb_path=self.adb_path, server=self.server, serial=serial, **self.client_options)
+
+    async def refresh(self) -> List[str]:
+        """
+        Discover attached devices and add any new ones to the pool.
+
+        Devices that disappeared are dropped once they have no active lease.
+
+        Returns:
+            Serials currently in the pool
+        """
+        if self._serials is not None:
+            online = list(self._serials)
+        else:
+            states = await self._create_client(None).getDeviceStates()
+            online = [serial for serial, state in states.items() if state == "device"]
+
+        async with self._condition:
+            for serial in online:
+                if serial not in self._slots:
+                    self._slots[serial] = DeviceSlot(self._create_client(serial))
+            for serial in list(self._slots):
+                slot = self._slots[serial]
+                if serial not in online and slot.load == 0:
+                    # The server is shared by every slot; the pool closes it
+                    await slot.client.close(close_server=False)
+                    del self._slots[serial]
+            self._condition.notify_all()
+        return list(self._slots)
+
+    def _pick(self) -> Optional[DeviceSlot]:
+        now = time.monotonic()
+        candidates = [
+            slot for slot in self._slots.values()
+            if slot.load < self.max_tasks_per_device and slot.healthy(now)
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda slot: (slot.failures, slot.load, slot.last_used))
+
+    async def acquire(self, timeout: Optional[float] = None) -> ADBClient:
+        """
+        Lease a device, waiting until one is free.
+
+        Args:
+            timeout: Seconds to wait for a free device, or None to wait forever
+
+        Returns:
+            An ADBClient scoped to the leased device
+        """
+        if not self._slots:
+            await self.refresh()
+        if not self._slots:
+            raise RuntimeError("No devices available in the pool")
+
+        async def wait_for_slot() -> DeviceSlot:
+            async with self._condition:
+                while True:
+                    slot = self._pick()
+                    if slot is not None:
+                        slot.load += 1
+                        slot.last_used = time.monotonic()
+                        return slot
+                    # Benched devices become eligible again without a release
+                    await self._wait(self._next_recovery())
+
+        slot = await asyncio.wait_for(wait_for_slot(), timeout)
+        return slot.client
+
+    async def _wait(self, delay: Optional[float]) -> None:
+        try:
+            await asyncio.wait_for(self._condition.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+    def _next_recovery(self) -> Optional[float]:
+        now = time.monotonic()
+        pending = [slot.unhealthy_until - now for slot in self._slots.values() if not slot.healthy(now)]
+        return max(min(pending), 0.0) if pending else None
+
+    async def release(self, client: ADBClient, failed: bool = False) -> None:
+        """
+        Return a leased device to the pool.
+
+        Args:
+            client: The client returned by acquire()
+            failed: Whether the task failed on this device
+        """
+        async with self._condition:
+            slot = self._slots.get(client.serial)
+            if slot is None:
+                return
+            slot.load -= 1
+            if failed:
+                slot.failures += 1
+                if slot.failures >= self.max_failures:
+                    slot.unhealthy_until = time.monotonic() + self.cooldown
+            else:
+                slot.failures = 0
+                slot.completed += 1
+            self._condition.notify_all()
+
+    @asynccontextmanager
+    async def lease(self, timeout: Optional[float] = None) -> AsyncIterator[ADBClient]:
+        """Lease a device for the duration of an ``async with`` block."""
+        client = await self.acquire(timeout)
+        failed = False
+        try:
+            yield client
+        except Exception:
+            failed = True
+            raise
+        finally:
+            await self.release(client, failed=failed)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-device load and health counters."""
+        now = time.monotonic()
+        return {
+            serial: {
+                "load": slot.load,
+                "failures": slot.failures,
+                "completed": slot.completed,
+                "healthy": slot.healthy(now)
+            }
+            for serial, slot in self._slots.items()
+        }
+
+    async def close(self) -> None:
+        """Close every device client in the pool, then the shared server client."""
+        for slot in self._slots.values():
+            await slot.client.close(close_server=False)
+        self._slots.clear()
+        if self.server is not None:
+            await self.server.close()
@@ -0,0 +1,108 @@
+"""
+Raw framebuffer captures from ``screencap`` without PNG encoding
+"""
+
+import base64
+import io
+import struct
+from typing import Any, Union
+
+# screencap pixel formats (android PixelFormat) and their bytes per pixel
+PIXEL_FORMATS = {
+    1: ("RGBA", 4),   # RGBA_8888
+    2: ("RGBX", 4),   # RGBX_8888
+    3: ("RGB", 3),    # RGB_888
+    4: ("BGR;16", 2), # RGB_565
+    5: ("BGRA", 4),   # BGRA_8888
+}
+
+
+class Framebuffer:
+    """
+    A raw screen capture that keeps the bytes returned by ``screencap``.
+
+    Pixel data is exposed as a memoryview / NumPy view over the original
+    buffer, so nothing is copied until the frame is encoded.
+    """
+
+    __slots__ = ("buffer", "width", "height", "pixel_format", "offset", "timestamp")
+
+    def __init__(self, buffer: Union[bytes, bytearray], width: int, height: int, pixel_format: int, offset: int, timestamp: float = 0.0):
+        self.buffer = buffer
+        self.width = width
+        self.height = height
+        self.pixel_format = pixel_format
+        self.offset = offset
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_screencap(cls, raw: Union[bytes, bytearray], timestamp: float = 0.0) -> "Framebuffer":
+        """
+        Parse the output of ``screencap`` (without ``-p``).
+
+        The header is width, height and format as little-endian uint32, followed
+        by a colour space field on Android 9 and later.
+
+        Args:
+            raw: The raw bytes written by screencap
+            timestamp: Capture time to attach to the frame (when the capture started)
+
+        Returns:
+            A Framebuffer viewing the pixel data inside raw
+        """
+        if len(raw) < 12:
+            raise ValueError(f"Framebuffer too short: {len(raw)} bytes")
+        width, height, pixel_format = struct.unpack_from("<III", raw, 0)
+        if pixel_format not in PIXEL_FORMATS:
+            raise ValueError(f"Unsupported pixel format: {pixel_format}")
+        size = width * height * PIXEL_FORMATS[pixel_format][1]
+        offset = len(raw) - size
+        if offset not in (12, 16):
+            raise ValueError(f"Framebuffer size mismatch: {len(raw)} bytes for {width}x{height}")
+        return cls(raw, width, height, pixel_format, offset, timestamp)
+
+    @property
+    def mode(self) -> str:
+        """The PIL raw mode of the pixel data."""
+        return PIXEL_FORMATS[self.pixel_format][0]
+
+    @property
+    def bytes_per_pixel(self) -> int:
+        return PIXEL_FORMATS[self.pixel_format][1]
+
+    @property
+    def pixels(self) -> memoryview:
+        """Zero-copy view of the pixel bytes."""
+        return memoryview(self.buffer)[self.offset:]
+
+    def to_numpy(self) -> Any:
+        """
+        Return the pixels as a (height, width, channels) uint8 array.
+
+        The array shares memory with the capture buffer (read-only when the
+        buffer is bytes). RGB_565 frames come back as (height, width) uint16.
+        """
+        import numpy as np
+
+        if self.bytes_per_pixel == 2:
+            return np.frombuffer(self.buffer, dtype="<u2", offset=self.offset).reshape(self.height, self.width)
+        return np.frombuffer(self.buffer, dtype=np.uint8, offset=self.offset).reshape(
+            self.height, self.width, self.bytes_per_pixel
+        )
+
+    def to_image(self) -> Any:
+        """Return a PIL Image backed by the capture buffer where possible."""
+        from PIL import Image
+
+        mode = "RGB" if self.bytes_per_pixel < 4 else "RGBA"
+        return Image.frombuffer(mode, (self.width, self.height), self.pixels, "raw", self.mode, 0, 1)
+
+    def to_png(self, compress_level: int = 1) -> bytes:
+        """Encode the frame as PNG on the host."""
+        output = io.BytesIO()
+        self.to_image().save(output, format="PNG", compress_level=compress_level)
+        return output.getvalue()
+
+    def to_base64_png(self) -> str:
+        """Encode the frame as a base64 PNG string for an LLM."""
+        return base64.b64encode(self.to_png()).decode("utf-8")
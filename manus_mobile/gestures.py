@@ -0,0 +1,337 @@
+"""
+Low-latency gesture engine that streams raw touch events to the device
+"""
+
+import math
+import re
+import struct
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from .adb_client import ADBClient
+
+# Linux input event types and codes (multi-touch protocol B)
+EV_SYN = 0
+EV_KEY = 1
+EV_ABS = 3
+SYN_REPORT = 0
+BTN_TOUCH = 0x14A
+ABS_MT_SLOT = 0x2F
+ABS_MT_TOUCH_MAJOR = 0x30
+ABS_MT_POSITION_X = 0x35
+ABS_MT_POSITION_Y = 0x36
+ABS_MT_TRACKING_ID = 0x39
+ABS_MT_PRESSURE = 0x3A
+
+Point = Tuple[int, int]
+
+# A frame is (time in ms since gesture start, {finger: position or None if lifted})
+TouchFrame = Tuple[int, Dict[int, Optional[Point]]]
+
+_DEVICE_PATTERN = re.compile(r"^add device \d+: (\S+)", re.MULTILINE)
+_AXIS_PATTERN = re.compile(r"(ABS_MT_\w+)\s*:.*?max (\d+)")
+
+# ABIs whose userspace uses a 64-bit struct timeval in input events
+_ABIS_64 = ("arm64-v8a", "x86_64", "riscv64")
+
+
+class TouchDevice:
+    """A multi-touch input device found with ``getevent -pl``."""
+
+    def __init__(self, path: str, max_x: int, max_y: int, max_slots: int, has_pressure: bool, has_touch_major: bool):
+        self.path = path
+        self.max_x = max_x
+        self.max_y = max_y
+        self.max_slots = max_slots
+        self.has_pressure = has_pressure
+        self.has_touch_major = has_touch_major
+
+    @classmethod
+    def find(cls, getevent_output: str) -> Optional["TouchDevice"]:
+        """
+        Pick the first protocol-B touchscreen from ``getevent -pl`` output.
+
+        Args:
+            getevent_output: stdout of ``getevent -pl``
+
+        Returns:
+            The touch device, or None if there is none
+        """
+        starts = list(_DEVICE_PATTERN.finditer(getevent_output))
+        for i, match in enumerate(starts):
+            end = starts[i + 1].start() if i + 1 < len(starts) else len(getevent_output)
+            axes = {name: int(value) for name, value in _AXIS_PATTERN.findall(getevent_output[match.end():end])}
+            if {"ABS_MT_POSITION_X", "ABS_MT_POSITION_Y", "ABS_MT_SLOT", "ABS_MT_TRACKING_ID"} <= axes.keys():
+                return cls(
+                    match.group(1),
+                    axes["ABS_MT_POSITION_X"],
+                    axes["ABS_MT_POSITION_Y"],
+                    axes["ABS_MT_SLOT"] + 1,
+                    "ABS_MT_PRESSURE" in axes,
+                    "ABS_MT_TOUCH_MAJOR" in axes
+                )
+        return None
+
+
+def tap_frames(point: Point, hold: int = 40) -> List[TouchFrame]:
+    """A single tap."""
+    return [(0, {0: point}), (hold, {0: None})]
+
+
+def double_tap_frames(point: Point, interval: int = 100, hold: int = 40) -> List[TouchFrame]:
+    """Two taps whose starts are interval ms apart, well inside the double-tap timeout."""
+    return tap_frames(point, hold) + [(t + interval, fingers) for t, fingers in tap_frames(point, hold)]
+
+
+def long_press_frames(point: Point, duration: int = 800) -> List[TouchFrame]:
+    """Press and hold."""
+    return tap_frames(point, duration)
+
+
+def path_frames(points: Sequence[Point], duration: int, hold: int = 0, step: int = 10) -> List[TouchFrame]:
+    """
+    Move one finger along a polyline.
+
+    Args:
+        points: Path vertices, at least two
+        duration: Milliseconds spent moving along the path
+        hold: Milliseconds to hold at the first point before moving (drag)
+        step: Milliseconds between interpolated move events
+    """
+    lengths = [math.dist(a, b) for a, b in zip(points, points[1:])]
+    total = sum(lengths) or 1.0
+    frames: List[TouchFrame] = [(0, {0: points[0]})]
+    steps = max(1, duration // step)
+    for n in range(1, steps + 1):
+        frames.append((hold + n * duration // steps, {0: _along(points, lengths, total * n / steps)}))
+    frames.append((frames[-1][0] + 1, {0: None}))
+    return frames
+
+
+def pinch_frames(center: Point, start_distance: int, end_distance: int, duration: int = 400, angle: float = 0.0, step: int = 10) -> List[TouchFrame]:
+    """Two fingers moving apart (zoom in) or together (zoom out) around a center."""
+    dx, dy = math.cos(angle) / 2, math.sin(angle) / 2
+    frames: List[TouchFrame] = []
+    steps = max(1, duration // step)
+    for n in range(steps + 1):
+        distance = start_distance + (end_distance - start_distance) * n / steps
+        frames.append((n * duration // steps, {
+            0: (round(center[0] - dx * distance), round(center[1] - dy * distance)),
+            1: (round(center[0] + dx * distance), round(center[1] + dy * distance)),
+        }))
+    frames.append((duration + 1, {0: None, 1: None}))
+    return frames
+
+
+def multi_tap_frames(points: Sequence[Point], hold: int = 40) -> List[TouchFrame]:
+    """Several fingers touching down and lifting together."""
+    return [
+        (0, {finger: point for finger, point in enumerate(points)}),
+        (hold, {finger: None for finger in range(len(points))}),
+    ]
+
+
+def _along(points: Sequence[Point], lengths: List[float], distance: float) -> Point:
+    for (a, b), length in zip(zip(points, points[1:]), lengths):
+        if distance <= length and length:
+            ratio = distance / length
+            return round(a[0] + (b[0] - a[0]) * ratio), round(a[1] + (b[1] - a[1]) * ratio)
+        distance -= length
+    return points[-1]
+
+
+def to_natural(point: Point, screen: Tuple[int, int], rotation: int) -> Point:
+    """
+    Map a point in current display coordinates to the panel's natural orientation.
+
+    Args:
+        point: (x, y) as seen on screen in the current rotation
+        screen: Natural (portrait for phones) screen (width, height)
+        rotation: Display rotation in quarter turns (SurfaceOrientation, 0-3)
+
+    Returns:
+        (x, y) in natural screen coordinates
+    """
+    x, y = point
+    width, height = screen
+    if rotation == 1:
+        return width - 1 - y, x
+    if rotation == 2:
+        return width - 1 - x, height - 1 - y
+    if rotation == 3:
+        return y, height - 1 - x
+    return x, y
+
+
+def pack_event(event_type: int, code: int, value: int, time_size: int = 16) -> bytes:
+    """A struct input_event with a zero timestamp (the kernel stamps injected events)."""
+    return bytes(time_size) + struct.pack("<HHi", event_type, code, value)
+
+
+def compile_frames(frames: Sequence[TouchFrame], device: TouchDevice, screen: Tuple[int, int], rotation: int = 0, time_size: int = 16) -> str:
+    """
+    Compile touch frames into one shell script writing raw input events.
+
+    Each frame becomes the protocol-B events for the fingers that changed
+    followed by SYN_REPORT, packed as struct input_event records and written
+    with a single printf; frames are separated by sleeps. The device node is
+    opened once for the whole gesture and the script stops at the first
+    failing command.
+
+    Args:
+        frames: Touch frames in time order, in current display coordinates
+        device: Target touch device
+        screen: Natural screen (width, height) in pixels, for scaling to device units
+        rotation: Current display rotation in quarter turns
+        time_size: Size of struct timeval on the device (16 on 64-bit, 8 on 32-bit)
+
+    Returns:
+        The shell script
+    """
+    scale_x = device.max_x / max(screen[0] - 1, 1)
+    scale_y = device.max_y / max(screen[1] - 1, 1)
+    active: Dict[int, Point] = {}
+    slots: Dict[int, int] = {}
+    next_tracking_id = 1
+    lines: List[str] = []
+    last_time = 0
+
+    for time_ms, fingers in frames:
+        if time_ms > last_time:
+            lines.append(f"sleep {(time_ms - last_time) / 1000:g}")
+            last_time = time_ms
+        was_touching = bool(active)
+        data = bytearray()
+
+        def event(event_type: int, code: int, value: int) -> None:
+            data.extend(pack_event(event_type, code, value, time_size))
+
+        for finger, point in fingers.items():
+            if point is None:
+                if finger not in active:
+                    continue
+                event(EV_ABS, ABS_MT_SLOT, slots.pop(finger))
+                event(EV_ABS, ABS_MT_TRACKING_ID, -1)
+                del active[finger]
+                continue
+            if finger not in active:
+                slot = min(set(range(device.max_slots)) - set(slots.values()))
+                slots[finger] = slot
+                event(EV_ABS, ABS_MT_SLOT, slot)
+                event(EV_ABS, ABS_MT_TRACKING_ID, next_tracking_id)
+                next_tracking_id += 1
+                if device.has_touch_major:
+                    event(EV_ABS, ABS_MT_TOUCH_MAJOR, 5)
+                if device.has_pressure:
+                    event(EV_ABS, ABS_MT_PRESSURE, 50)
+            elif active[finger] == point:
+                continue
+            else:
+                event(EV_ABS, ABS_MT_SLOT, slots[finger])
+            x, y = to_natural(point, screen, rotation)
+            event(EV_ABS, ABS_MT_POSITION_X, round(x * scale_x))
+            event(EV_ABS, ABS_MT_POSITION_Y, round(y * scale_y))
+            active[finger] = point
+        if active and not was_touching:
+            event(EV_KEY, BTN_TOUCH, 1)
+        elif was_touching and not active:
+            event(EV_KEY, BTN_TOUCH, 0)
+        event(EV_SYN, SYN_REPORT, 0)
+        lines.append("printf '" + "".join(f"\\{byte:03o}" for byte in data) + "'")
+    return f"({' && '.join(lines)}) > {device.path}"
+
+
+class GestureEngine:
+    """
+    Precompute touch event sequences and stream them in one round trip.
+
+    The whole gesture is compiled into a single shell script that writes
+    raw input events, one printf per frame with sleeps between frames, so
+    timing is decided on the device rather than by host round trips or
+    per-event process spawns. Coordinates are given as seen on screen and
+    mapped through the display rotation cached in DeviceInfo. Devices
+    without a multi-touch screen, or whose event node cannot be written,
+    fall back to ``input`` commands where possible.
+    """
+
+    def __init__(self, adb_client: "ADBClient", screen: Optional[Tuple[int, int]] = None):
+        """
+        Initialize the engine.
+
+        Args:
+            adb_client: Client for the device
+            screen: Natural screen (width, height); queried from the device when None
+        """
+        self.adb_client = adb_client
+        self.screen = screen
+        self.device: Optional[TouchDevice] = None
+        self.time_size = 16
+        self._probed = False
+
+    async def setup(self) -> Optional[TouchDevice]:
+        """Find the touch device, event layout and screen size (once)."""
+        if not self._probed:
+            result = await self.adb_client.shell("getprop ro.product.cpu.abi; getevent -pl")
+            abi, _, getevent_output = result["stdout"].partition("\n")
+            self.device = TouchDevice.find(getevent_output)
+            self.time_size = 16 if abi.strip() in _ABIS_64 else 8
+            if self.screen is None:
+                size = await self.adb_client.screenSize()
+                self.screen = (size["width"], size["height"])
+            self._probed = True
+        return self.device
+
+    async def rotation(self) -> int:
+        """Display rotation in quarter turns, from the cached DeviceInfo."""
+        return (await self.adb_client.deviceInfo()).orientation or 0
+
+    async def compile(self, frames: Sequence[TouchFrame]) -> Optional[str]:
+        """The shell script writing the frames, or None without a writable touch device."""
+        device = await self.setup()
+        if device is None:
+            return None
+        return compile_frames(frames, device, self.screen, await self.rotation(), self.time_size)
+
+    async def perform(self, frames: Sequence[TouchFrame]) -> Dict[str, str]:
+        """Stream precomputed touch frames to the device."""
+        script = await self.compile(frames)
+        if script is None:
+            raise RuntimeError("No writable multi-touch input device available for raw gestures")
+        return await self.adb_client.shell(script)
+
+    async def _perform_or(self, frames: Sequence[TouchFrame], fallback: str) -> Dict[str, str]:
+        if await self.setup() is not None:
+            result = await self.perform(frames)
+            if not result.get("exit_code"):
+                return result
+            # The event node could not be written (e.g. permission denied); use input from now on
+            self.device = None
+        return await self.adb_client.shell(fallback)
+
+    async def tap(self, x: int, y: int) -> Dict[str, str]:
+        return await self._perform_or(tap_frames((x, y)), f"input tap {x} {y}")
+
+    async def double_tap(self, x: int, y: int, interval: int = 100) -> Dict[str, str]:
+        return await self._perform_or(double_tap_frames((x, y), interval), f"input tap {x} {y} && input tap {x} {y}")
+
+    async def long_press(self, x: int, y: int, duration: int = 800) -> Dict[str, str]:
+        return await self._perform_or(long_press_frames((x, y), duration), f"input swipe {x} {y} {x} {y} {duration}")
+
+    async def swipe(self, start: Point, end: Point, duration: int = 300) -> Dict[str, str]:
+        """Swipe or fling; short durations produce a fling."""
+        fallback = f"input swipe {start[0]} {start[1]} {end[0]} {end[1]} {duration}"
+        return await self._perform_or(path_frames([start, end], duration), fallback)
+
+    async def drag(self, points: Sequence[Point], duration: int = 600, hold: int = 800) -> Dict[str, str]:
+        """Long-press at the first point, then drag along the path."""
+        start, end = points[0], points[-1]
+        fallback = f"input draganddrop {start[0]} {start[1]} {end[0]} {end[1]} {duration + hold}"
+        return await self._perform_or(path_frames(points, duration, hold=hold), fallback)
+
+    async def pinch(self, center: Point, start_distance: int, end_distance: int, duration: int = 400) -> Dict[str, str]:
+        """Two-finger pinch; end_distance > start_distance zooms in."""
+        return await self.perform(pinch_frames(center, start_distance, end_distance, duration))
+
+    async def multi_tap(self, points: Sequence[Point]) -> Dict[str, str]:
+        """Tap with several fingers at once."""
+        return await self.perform(multi_tap_frames(points))
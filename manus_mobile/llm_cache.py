@@ -0,0 +1,269 @@
+"""
+Cache of LLM decisions keyed by task, prompt and a normalized UI fingerprint
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .agent import get_tool_calls
+
+# Digit runs (clocks, prices, counters, dates) are replaced before hashing
+_VOLATILE_PATTERN = re.compile(r"\d+(?:[.,:]\d+)*")
+
+
+def normalize_text(value: str) -> str:
+    """Replace volatile numbers in UI text with a placeholder."""
+    return _VOLATILE_PATTERN.sub("#", value)
+
+
+# Attributes whose values are normalized; everything else (bounds in
+# particular) stays exact so cached coordinates only replay onto the same layout
+_TEXT_ATTRS = ("text", "content-desc")
+
+
+def _normalize_ui(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {
+            key: normalize_text(item) if key in _TEXT_ATTRS and isinstance(item, str) else _normalize_ui(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_normalize_ui(item) for item in value]
+    return value
+
+
+def ui_fingerprint(ui_data: Dict[str, Any]) -> str:
+    """
+    Hash a parsed UI hierarchy (or ui_diff) ignoring volatile numbers in text.
+
+    Digit runs in text and content-desc are normalized, which covers clocks,
+    prices and counters. Bounds are kept exactly: cached decisions carry
+    absolute coordinates, so a scrolled list or another resolution must not
+    map to the same key.
+
+    Args:
+        ui_data: Output of parse_ui_dump / UITree.to_dict, or a ui_diff delta
+
+    Returns:
+        A hex digest that is equal for screens differing only in text numbers
+    """
+    normalized = json.dumps(_normalize_ui(ui_data), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def _latest_ui(messages: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Fingerprint of the UI hierarchy returned by the last tool call.
+
+    None unless the newest tool result after the last assistant message is
+    a hierarchy (or ui_diff): after a screenshot, an "Executed ..." result
+    or before any observation, nobody has checked what the screen shows.
+    """
+    for message in reversed(messages):
+        role = message.get("role")
+        if role == "assistant":
+            return None
+        if role != "tool":
+            continue
+        try:
+            content = json.loads(message.get("content") or "")
+        except (TypeError, ValueError):
+            return None
+        if isinstance(content, dict) and ("children" in content or content.get("type") == "ui_diff"):
+            return ui_fingerprint(content)
+        return None
+    return None
+
+
+def _jsonable(response: Any) -> Dict[str, Any]:
+    """A JSON-serializable copy of a tool-call response."""
+    tool_calls = get_tool_calls(response)
+    content = response.get("content") if isinstance(response, dict) else getattr(response, "content", None)
+    return {
+        "role": "assistant",
+        "content": content if isinstance(content, str) else "",
+        "tool_calls": [
+            {
+                "id": call["id"],
+                "type": "function",
+                "function": {"name": call["name"], "arguments": json.dumps(call["arguments"])}
+            }
+            for call in tool_calls
+        ]
+    }
+
+
+class DecisionCache:
+    """
+    LRU + TTL cache of LLM tool-call decisions, optionally backed by a directory.
+
+    The key combines a namespace (e.g. the model), the system prompt, the
+    task, the tool calls made so far and a fingerprint of the newest UI
+    observation, so a repeated run on the same screens maps to the same
+    decisions. Only responses carrying tool calls are stored; plain text
+    answers and provider errors always go to the LLM. Requests whose last
+    tool result is not a UI hierarchy (a screenshot, an action without an
+    observation, or no tool call yet) bypass the cache entirely.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = 7 * 24 * 3600, directory: Optional[str] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Entries kept in memory (least recently used are evicted)
+            ttl: Seconds an entry stays valid, or None for no expiry
+            directory: Directory for the on-disk backend (one JSON file per
+                       entry), or None to keep the cache in memory only
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.directory = directory
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bypassed = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def make_key(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None, namespace: str = "") -> str:
+        """Build the cache key for an LLM request."""
+        return self._key(messages, tools, namespace, _latest_ui(messages))
+
+    def _key(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]], namespace: str, fingerprint: Optional[str]) -> str:
+        system = next((m.get("content") for m in messages if m.get("role") == "system"), "")
+        task = next((m.get("content") for m in messages if m.get("role") == "user"), "")
+        actions = [
+            [call["name"], call["arguments"]]
+            for message in messages if message.get("role") == "assistant"
+            for call in get_tool_calls(message)
+        ]
+        tool_names = sorted(
+            (tool.get("function") or tool).get("name", "") for tool in tools or []
+        )
+        material = json.dumps(
+            [namespace, system, task, actions, tool_names, fingerprint],
+            sort_keys=True, default=str
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached response for a key, or None."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if not self._expired(entry[0]):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._entries[key]
+
+        if self.directory:
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    stored = json.load(f)
+            except (OSError, ValueError):
+                stored = None
+            if stored is not None:
+                if not self._expired(stored["stored_at"]):
+                    self._remember(key, stored["stored_at"], stored["response"])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return stored["response"]
+                self._remove_file(key)
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, response: Any) -> None:
+        """Store a response if it carries tool calls."""
+        if not get_tool_calls(response):
+            return
+        stored_at = time.time()
+        response = _jsonable(response)
+        self._remember(key, stored_at, response)
+        if self.directory:
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"stored_at": stored_at, "response": response}, f)
+            os.replace(tmp_path, path)
+
+    def _remember(self, key: str, stored_at: float, response: Dict[str, Any]) -> None:
+        self._entries[key] = (stored_at, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _remove_file(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def prune(self) -> int:
+        """Delete expired entries from memory and disk; returns how many files were removed."""
+        for key in [key for key, (stored_at, _) in self._entries.items() if self._expired(stored_at)]:
+            del self._entries[key]
+        removed = 0
+        if self.directory and self.ttl is not None:
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if name.endswith(".json") and time.time() - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+    def clear(self) -> None:
+        """Drop every entry, including the on-disk ones."""
+        self._entries.clear()
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    self._remove_file(name[:-len(".json")])
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit, miss and eviction counts and the hit rate."""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+    async def call(self, llm_function: Callable[..., Awaitable[Any]], messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None, namespace: str = "") -> Any:
+        """Answer from the cache, or call the LLM and remember its tool calls."""
+        fingerprint = _latest_ui(messages)
+        if fingerprint is None:
+            self.bypassed += 1
+            return await llm_function(messages, tools=tools)
+        key = self._key(messages, tools, namespace, fingerprint)
+        cached = self.get(key)
+        if cached is not None:
+            return json.loads(json.dumps(cached))
+        response = await llm_function(messages, tools=tools)
+        self.put(key, response)
+        return response
+
+    def wrap(self, llm_function: Callable[..., Awaitable[Any]], namespace: str = "") -> Callable[..., Awaitable[Any]]:
+        """Return an LLM function that goes through this cache."""
+        async def cached_llm_function(messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None) -> Any:
+            return await self.call(llm_function, messages, tools, namespace)
+        return cached_llm_function
@@ -2,17 +2,277 @@ from typing import Dict, List, Any, Optional, Union
 import base64
 import json
 import asyncio
+import time
 
 from .adb_client import ADBClient, Coordinate
+from .framebuffer import Framebuffer
+from .screen_stream import ScreenStream
+from .ui_diff import diff_ui, is_small_diff
+from .ui_tree import UITree
+
+MOBILE_COMPUTER_DESCRIPTION = """Mobile tool to perform actions on a mobile device.
+You have the following actions:
+dump_ui: Use this action to get current screen and associated UI elements that you can interact with.
+tap: Use this to tap. You need to provide coordinate.
+swipe: Use this to swipe. You need to provide start_coordinate and end_coordinate to start your swipe to end.
+type: Use this to type what you want to. Provide what you want to type in text.
+press: Any key you want to press. Provide the key as text.
+screenshot: Take a screenshot of the current screen.
+batch: Run several tap, double_tap, swipe, type, press or wait steps in one go. Provide them in actions, each with an optional delay in milliseconds after it. Only the screen after the last step is returned; if a step fails, the batch stops there and the error names that step.
+"""
+
+UI_DIFF_NOTE = """After tap, swipe, type, press and batch you may get a ui_diff listing only the elements that changed, were added or were removed since the previous observation. Use dump_ui to get the full hierarchy.
+"""
+
+# What input actions return: nothing, a handle that dumps when read, the UI
+# hierarchy, or a screenshot
+OBSERVATION_POLICIES = ("none", "lazy", "dump", "screenshot")
+
+class LazyObservation:
+    """
+    Deferred post-action observation.
+    
+    Nothing is dumped until read() is awaited; the result is then kept, so
+    repeated reads cost nothing.
+    """
+    
+    def __init__(self, computer: "MobileComputer"):
+        self.computer = computer
+        self._result: Optional[str] = None
+    
+    async def read(self) -> str:
+        """
+        Dump the UI hierarchy (once) and return it as JSON.
+
+        Always the full tree: a ui_diff would be relative to an observation
+        the reader may never have seen.
+        """
+        if self._result is None:
+            self._result = await self.computer.observe_ui(full=True)
+        return self._result
+    
+    async def tree(self) -> UITree:
+        """Return the UI hierarchy as a UITree."""
+        return await self.computer.get_ui_tree()
+    
+    def __str__(self) -> str:
+        return "Action executed; observation deferred. Use dump_ui to read the screen."
 
 class MobileComputer:
     """Tool for interacting with a mobile device."""
     
-    def __init__(self, adb_client: ADBClient, height: int, width: int):
-        """Initialize the mobile computer with screen dimensions."""
+    def __init__(self, adb_client: ADBClient, height: int, width: int, screenshot_mode: str = "png", ui_diff: bool = False, ui_cache_ttl: float = 0.0, observation: str = "dump"):
+        """
+        Initialize the mobile computer with screen dimensions.
+        
+        screenshot_mode selects how screenshots are captured: "png" has the
+        device encode the image, "raw" pulls the framebuffer and encodes it on
+        the host only when a screenshot is returned to the LLM.
+        
+        With ui_diff enabled, tap/press/type/swipe return only what changed
+        since the previous observation; dump_ui always returns the full tree.
+        
+        UI dumps and screenshots can be cached for ui_cache_ttl seconds (the
+        default 0 disables the cache, since screens also change on their
+        own); input actions and foreground watcher events invalidate the
+        cache immediately. Observations taken by prefetch() stay valid
+        until then regardless of the TTL.
+        
+        observation is the default policy for what tap/press/type/swipe
+        return (see OBSERVATION_POLICIES); execute() can override it per call.
+        """
         self.adb_client = adb_client
         self.height = height
         self.width = width
+        self.screenshot_mode = screenshot_mode
+        self.stream: Optional[ScreenStream] = None
+        self.stream_max_age = 1.0
+        self.ui_diff = ui_diff
+        self.last_tree: Optional[UITree] = None
+        self._last_ui: Optional[Dict[str, Any]] = None
+        # Hierarchy the LLM last received; ui_diff deltas are computed against
+        # it, so prefetching into the cache does not move the baseline
+        self._diff_base: Optional[Dict[str, Any]] = None
+        self.ui_cache_ttl = ui_cache_ttl
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._ui_cached_at: Optional[float] = None
+        self._ui_json: Optional[str] = None
+        self._screenshot: Optional[Dict[str, str]] = None
+        self._screenshot_at: Optional[float] = None
+        # Bumped by every input action and watcher event; prefetched
+        # observations are valid while their generation is current
+        self.generation = 0
+        # time.time() of the last input action or watcher event; frames from
+        # the stream must have been captured after it
+        self.last_action_at = 0.0
+        self._ui_generation: Optional[int] = None
+        self._screenshot_generation: Optional[int] = None
+        adb_client.app_watcher.add_listener(self._on_device_event)
+        # Optional TrajectoryRecorder capturing input actions and their anchors
+        self.recorder = None
+        if observation not in OBSERVATION_POLICIES:
+            raise ValueError(f"Unknown observation policy: {observation}")
+        self.observation = observation
+    
+    def invalidate_ui_cache(self) -> None:
+        """Forget the cached UI hierarchy and screenshot, e.g. after an input event."""
+        self.generation += 1
+        self.last_action_at = time.time()
+        self._ui_cached_at = None
+        self._ui_json = None
+        self._screenshot_at = None
+        self._screenshot = None
+    
+    def _on_device_event(self, event: str, data: Dict[str, Any]) -> None:
+        """Activity and configuration changes make cached observations stale."""
+        self.invalidate_ui_cache()
+    
+    def _ui_cache_valid(self) -> bool:
+        if self._ui_generation == self.generation:
+            return True
+        return (
+            self._ui_cached_at is not None
+            and time.monotonic() - self._ui_cached_at <= self.ui_cache_ttl
+        )
+    
+    def _screenshot_cache_valid(self) -> bool:
+        if self._screenshot_generation == self.generation:
+            return True
+        return (
+            self._screenshot_at is not None
+            and time.monotonic() - self._screenshot_at <= self.ui_cache_ttl
+        )
+    
+    async def prefetch(self, screenshot: bool = True) -> None:
+        """
+        Fill the observation cache ahead of time, e.g. while the LLM is thinking.
+        
+        The UI dump and (optionally) the screenshot are captured concurrently
+        unless still cached; a following dump_ui or screenshot action is then
+        served from the cache until the next input action or watcher event.
+        """
+        jobs = []
+        if not self._ui_cache_valid():
+            jobs.append(self._refresh_ui(prefetched=True))
+        if screenshot and not self._screenshot_cache_valid():
+            jobs.append(self._capture_screenshot(prefetched=True))
+        if jobs:
+            await asyncio.gather(*jobs)
+    
+    async def _capture_screenshot(self, prefetched: bool = False) -> Dict[str, str]:
+        """Take a screenshot and cache it until the next input action."""
+        generation = self.generation
+        if self.screenshot_mode == "raw" or (self.stream is not None and self.stream.running):
+            frame = await self.capture_frame()
+            result = {"data": frame.to_base64_png(), "type": "image/png"}
+        else:
+            screenshot = await self.adb_client.screenshot()
+            result = {
+                "data": base64.b64encode(screenshot).decode("utf-8"),
+                "type": "image/png"
+            }
+        if generation == self.generation:
+            self._screenshot, self._screenshot_at = result, time.monotonic()
+            self._screenshot_generation = generation if prefetched else None
+        return result
+    
+    async def get_ui_tree(self) -> UITree:
+        """Return the current UI hierarchy, reusing the cached dump while it is valid."""
+        if self._ui_cache_valid():
+            self.cache_hits += 1
+            return self.last_tree
+        self.cache_misses += 1
+        await self._refresh_ui()
+        return self.last_tree
+    
+    async def _refresh_ui(self, prefetched: bool = False) -> None:
+        """Dump the hierarchy into the cache."""
+        generation = self.generation
+        tree = await self.adb_client.dumpUITree()
+        self.last_tree, self._last_ui = tree, None
+        self._ui_json = None
+        if generation == self.generation:
+            self._ui_cached_at = time.monotonic()
+            self._ui_generation = generation if prefetched else None
+        else:
+            # An input action ran during the dump, so it may show the old screen
+            self._ui_cached_at = None
+    
+    @property
+    def last_ui(self) -> Optional[Dict[str, Any]]:
+        """The cached hierarchy as nested dictionaries, built only when first needed."""
+        if self._last_ui is None and self.last_tree is not None:
+            self._last_ui = self.last_tree.to_dict()
+        return self._last_ui
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit and miss counts of the UI hierarchy cache."""
+        total = self.cache_hits + self.cache_misses
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": self.cache_hits / total if total else 0.0
+        }
+    
+    async def observe_ui(self, full: bool = True) -> str:
+        """
+        Dump the UI hierarchy (or reuse the cached one) and serialize it for the LLM.
+        
+        Args:
+            full: Return the whole hierarchy even when ui_diff is enabled
+            
+        Returns:
+            JSON of the full hierarchy, or of a ui_diff delta against the
+            hierarchy last returned from here when that is smaller
+        """
+        await self.get_ui_tree()
+        if self.ui_diff:
+            base, self._diff_base = self._diff_base, self.last_ui
+            if not full and base is not None and base is not self.last_ui:
+                delta = diff_ui(base, self.last_ui)
+                if is_small_diff(delta):
+                    return json.dumps(delta)
+        
+        if self._ui_json is None:
+            self._ui_json = json.dumps(self.last_ui)
+        return self._ui_json
+    
+    def start_stream(self, buffer_size: int = 4, interval: float = 0.0, max_age: float = 1.0) -> ScreenStream:
+        """
+        Start capturing frames in the background.
+        
+        While the stream runs, screenshots return the newest buffered frame
+        if it is at most max_age seconds old and was captured after the last
+        input action.
+        """
+        if self.stream is None:
+            self.stream = ScreenStream(self.adb_client, buffer_size=buffer_size, interval=interval)
+        self.stream_max_age = max_age
+        self.stream.start()
+        return self.stream
+    
+    async def stop_stream(self) -> None:
+        """Stop the background screen stream."""
+        if self.stream is not None:
+            await self.stream.stop()
+    
+    async def capture_frame(self) -> Framebuffer:
+        """
+        Capture the raw framebuffer without any encoding.
+        
+        With the stream running, the newest frame is used if its capture
+        started after the last input action and at most stream_max_age ago;
+        otherwise the next such frame is awaited for up to stream_max_age
+        seconds before falling back to a direct capture.
+        """
+        if self.stream is not None and self.stream.running:
+            after = max(self.last_action_at, time.time() - self.stream_max_age)
+            try:
+                return await self.stream.next_frame(after, timeout=self.stream_max_age)
+            except (asyncio.TimeoutError, RuntimeError):
+                pass
+        return await self.adb_client.screenshotRaw()
     
     async def execute(self, 
                      action: str,
@@ -20,31 +280,67 @@ class MobileComputer:
                      start_coordinate: Optional[List[int]] = None,
                      end_coordinate: Optional[List[int]] = None,
                      text: Optional[str] = None,
-                     duration: Optional[int] = None) -> Union[str, Dict[str, Any]]:
-        """Execute the specified mobile action."""
+                     duration: Optional[int] = None,
+                     observation: Optional[str] = None,
+                     actions: Optional[List[Dict[str, Any]]] = None) -> Union[str, Dict[str, Any], "LazyObservation"]:
+        """
+        Execute the specified mobile action.
+        
+        observation overrides the computer's default policy for what input
+        actions return: "none", "lazy", "dump" or "screenshot".
+        """
+        observation = observation or self.observation
+        if observation not in OBSERVATION_POLICIES:
+            return f"Error: Invalid observation '{observation}'"
         
+        params = {
+            "action": action,
+            "coordinate": coordinate,
+            "start_coordinate": start_coordinate,
+            "end_coordinate": end_coordinate,
+            "text": text,
+            "duration": duration,
+            "actions": actions
+        }
+        if self.recorder is not None and action not in ("dump_ui", "screenshot"):
+            return await self.recorder.record(self, params, lambda: self._perform(observation=observation, **params))
+        return await self._perform(observation=observation, **params)
+    
+    async def _perform(self,
+                       action: str,
+                       coordinate: Optional[List[int]],
+                       start_coordinate: Optional[List[int]],
+                       end_coordinate: Optional[List[int]],
+                       text: Optional[str],
+                       duration: Optional[int],
+                       observation: str,
+                       actions: Optional[List[Dict[str, Any]]]) -> Union[str, Dict[str, Any], "LazyObservation"]:
+        """Perform a validated action."""
         if action == "dump_ui":
-            return await self.adb_client.dumpUI()
+            return await self.observe_ui()
             
         if action == "tap" and coordinate:
             x, y = coordinate
             await self.adb_client.tap(Coordinate(x, y))
-            return await self.adb_client.dumpUI()
+            self.invalidate_ui_cache()
+            return await self._observe_after(action, observation)
             
         if action == "press" and text:
             await self.adb_client.keyPress(text)
-            return await self.adb_client.dumpUI()
+            self.invalidate_ui_cache()
+            return await self._observe_after(action, observation)
             
         if action == "type" and text:
             await self.adb_client.type(text)
-            return await self.adb_client.dumpUI()
+            self.invalidate_ui_cache()
+            return await self._observe_after(action, observation)
             
         if action == "screenshot":
-            screenshot = await self.adb_client.screenshot()
-            return {
-                "data": base64.b64encode(screenshot).decode("utf-8"),
-                "type": "image/png"
-            }
+            if self._screenshot_cache_valid():
+                self.cache_hits += 1
+                return self._screenshot
+            self.cache_misses += 1
+            return await self._capture_screenshot()
             
         if action == "swipe" and start_coordinate and end_coordinate:
             start_x, start_y = start_coordinate
@@ -54,32 +350,53 @@ class MobileComputer:
                 Coordinate(end_x, end_y),
                 duration or 300
             )
-            return await self.adb_client.dumpUI()
+            self.invalidate_ui_cache()
+            return await self._observe_after(action, observation)
+            
+        if action == "batch" and actions:
+            try:
+                result = await self.adb_client.batch(actions)
+            finally:
+                self.invalidate_ui_cache()
+            failed = result["failed_step"]
+            if failed is not None:
+                output = (result["stderr"] or result["stdout"]).strip()
+                return (
+                    f"Error: batch step {failed} ({actions[failed].get('action')}) failed with exit code "
+                    f"{result['exit_code']}{': ' + output if output else ''}"
+                    f"{'; the steps after it were not run' if failed < len(actions) - 1 else ''}. Check the screen before continuing."
+                )
+            return await self._observe_after(action, observation)
             
         # If we reach here, the action was invalid or missing required parameters
         return f"Error: Invalid action '{action}' or missing required parameters"
     
+    async def _observe_after(self, action: str, observation: str) -> Union[str, Dict[str, Any], "LazyObservation"]:
+        """Produce the result of an input action according to the observation policy."""
+        if observation == "none":
+            return f"Executed {action}"
+        if observation == "lazy":
+            return LazyObservation(self)
+        if observation == "screenshot":
+            return await self.execute("screenshot")
+        return await self.observe_ui(full=False)
+    
     def get_tool_description(self) -> Dict[str, Any]:
         """Get the tool description for LLM."""
+        description = MOBILE_COMPUTER_DESCRIPTION
+        if self.ui_diff:
+            description += UI_DIFF_NOTE
         return {
             "type": "function",
             "function": {
                 "name": "mobile_computer",
-                "description": """Mobile tool to perform actions on a mobile device.
-You have the following actions:
-dump_ui: Use this action to get current screen and associated UI elements that you can interact with.
-tap: Use this to tap. You need to provide coordinate.
-swipe: Use this to swipe. You need to provide start_coordinate and end_coordinate to start your swipe to end.
-type: Use this to type what you want to. Provide what you want to type in text.
-press: Any key you want to press. Provide the key as text.
-screenshot: Take a screenshot of the current screen.
-""",
+                "description": description,
                 "parameters": {
                     "type": "object",
                     "properties": {
                         "action": {
                             "type": "string",
-                            "enum": ["dump_ui", "tap", "swipe", "type", "press", "screenshot"],
+                            "enum": ["dump_ui", "tap", "swipe", "type", "press", "screenshot", "batch"],
                             "description": "The action to perform on the mobile device"
                         },
                         "coordinate": {
@@ -104,6 +421,34 @@ screenshot: Take a screenshot of the current screen.
                         "duration": {
                             "type": "integer",
                             "description": "Duration for operations like swipes in milliseconds"
+                        },
+                        "observation": {
+                            "type": "string",
+                            "enum": ["none", "dump", "screenshot"],
+                            "description": "What tap, swipe, type, press and batch return: nothing, the UI hierarchy (default) or a screenshot"
+                        },
+                        "actions": {
+                            "type": "array",
+                            "description": "Steps for the batch action",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "action": {
+                                        "type": "string",
+                                        "enum": ["tap", "double_tap", "swipe", "type", "press", "wait"]
+                                    },
+                                    "coordinate": {"type": "array", "items": {"type": "integer"}},
+                                    "start_coordinate": {"type": "array", "items": {"type": "integer"}},
+                                    "end_coordinate": {"type": "array", "items": {"type": "integer"}},
+                                    "text": {"type": "string"},
+                                    "duration": {"type": "integer"},
+                                    "delay": {
+                                        "type": "integer",
+                                        "description": "Milliseconds to wait after this step"
+                                    }
+                                },
+                                "required": ["action"]
+                            }
                         }
                     },
                     "required": ["action"]
@@ -111,12 +456,16 @@ screenshot: Take a screenshot of the current screen.
             }
         }
 
-async def create_mobile_computer(adb_client: ADBClient) -> MobileComputer:
+async def create_mobile_computer(adb_client: ADBClient, screenshot_mode: str = "png", ui_diff: bool = False, ui_cache_ttl: float = 0.0, observation: str = "dump") -> MobileComputer:
     """
     Factory function to create a mobile computer tool with proper screen dimensions.
     
     Args:
         adb_client: An initialized ADBClient
+        screenshot_mode: "png" (encoded on device) or "raw" (encoded on host)
+        ui_diff: Return deltas instead of full hierarchies after actions
+        ui_cache_ttl: Seconds a UI dump may be reused (0, the default, disables caching)
+        observation: Default observation policy for input actions
         
     Returns:
         A configured MobileComputer tool
@@ -128,5 +477,9 @@ async def create_mobile_computer(adb_client: ADBClient) -> MobileComputer:
     return MobileComputer(
         adb_client=adb_client,
         height=viewport_size["height"],
-        width=viewport_size["width"]
+        width=viewport_size["width"],
+        screenshot_mode=screenshot_mode,
+        ui_diff=ui_diff,
+        ui_cache_ttl=ui_cache_ttl,
+        observation=observation
     ) 
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+Process-wide registry of warm clients, computers, tool providers and LLM adapters
+"""
+
+import asyncio
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from .adb_client import ADBClient
+from .mobile_computer import MobileComputer, create_mobile_computer
+from .tools import MobileToolProvider
+
+if TYPE_CHECKING:
+    from .core import LLMFunctionAdapter
+
+
+class ClientRegistry:
+    """
+    Reuse per-device and per-model objects across tasks.
+
+    Clients are keyed by (adb_path, serial); computers and tool providers by
+    the client they wrap, so clients leased from a DevicePool are covered
+    too; LLM adapters by model name. Call ``aclose()`` (or use the registry
+    as an async context manager) to release everything.
+
+    Registered objects hold event-loop-bound state (semaphores, shell
+    pipes, server connections, provider HTTP clients), so they are only
+    reused within one event loop: when a lookup happens on a different
+    loop, e.g. in the next ``asyncio.run``, the registry starts over.
+    """
+
+    def __init__(self):
+        self._clients: Dict[Tuple[str, Optional[str]], ADBClient] = {}
+        self._computers: Dict[ADBClient, MobileComputer] = {}
+        self._providers: Dict[ADBClient, MobileToolProvider] = {}
+        self._adapters: Dict[str, "LLMFunctionAdapter"] = {}
+        # Event loop the registered objects were created on
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.hits = 0
+        self.misses = 0
+        self.loop_resets = 0
+
+    def _check_loop(self) -> None:
+        """Forget the objects of an earlier event loop; they cannot be used (or closed) from this one."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if loop is not self._loop:
+            if self._loop is not None:
+                self.loop_resets += 1
+                self._forget()
+            self._loop = loop
+
+    def _forget(self) -> None:
+        self._clients.clear()
+        self._computers.clear()
+        self._providers.clear()
+        self._adapters.clear()
+
+    def client(self, adb_path: Optional[str] = None, serial: Optional[str] = None, **options: Any) -> ADBClient:
+        """
+        Return the client for a device, creating it on first use.
+
+        Args:
+            adb_path: Path to the adb binary
+            serial: Device serial, or None for adb's default device
+            **options: Extra ADBClient arguments, used only when creating it
+        """
+        self._check_loop()
+        key = (adb_path or "adb", serial)
+        client = self._clients.get(key)
+        if client is None:
+            self.misses += 1
+            client = ADBClient(adb_path=adb_path, serial=serial, **options)
+            self._clients[key] = client
+        else:
+            self.hits += 1
+        return client
+
+    async def computer(self, adb_client: ADBClient, **options: Any) -> MobileComputer:
+        """Return the MobileComputer for a client; options are create_mobile_computer arguments."""
+        self._check_loop()
+        computer = self._computers.get(adb_client)
+        if computer is None:
+            self.misses += 1
+            computer = await create_mobile_computer(adb_client, **options)
+            self._computers[adb_client] = computer
+        else:
+            self.hits += 1
+        return computer
+
+    async def tool_provider(self, adb_client: ADBClient) -> MobileToolProvider:
+        """Return the MobileToolProvider for a client, sharing its MobileComputer."""
+        self._check_loop()
+        provider = self._providers.get(adb_client)
+        if provider is None:
+            self.misses += 1
+            provider = MobileToolProvider(adb_client, await self.computer(adb_client))
+            self._providers[adb_client] = provider
+        else:
+            self.hits += 1
+        return provider
+
+    def llm_adapter(self, model_name: str = "default") -> "LLMFunctionAdapter":
+        """Return the LLM adapter for a model, loading its configuration once."""
+        from .core import LLMFunctionAdapter
+
+        self._check_loop()
+        adapter = self._adapters.get(model_name)
+        if adapter is None:
+            self.misses += 1
+            adapter = LLMFunctionAdapter(model_name=model_name)
+            self._adapters[model_name] = adapter
+        else:
+            self.hits += 1
+        return adapter
+
+    def stats(self) -> Dict[str, int]:
+        """Registered object counts and lookup hit/miss counts."""
+        return {
+            "clients": len(self._clients),
+            "computers": len(self._computers),
+            "tool_providers": len(self._providers),
+            "llm_adapters": len(self._adapters),
+            "hits": self.hits,
+            "misses": self.misses,
+            "loop_resets": self.loop_resets
+        }
+
+    async def aclose(self) -> None:
+        """Stop screen streams, close the clients this registry created and forget everything."""
+        for computer in self._computers.values():
+            await computer.stop_stream()
+        for client in self._clients.values():
+            await client.close()
+        self._forget()
+        self._loop = None
+
+    async def __aenter__(self) -> "ClientRegistry":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+
+_default_registry: Optional[ClientRegistry] = None
+
+
+def get_registry() -> ClientRegistry:
+    """The process-wide default registry used by mobile_use."""
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = ClientRegistry()
+    return _default_registry
@@ -0,0 +1,164 @@
+"""
+Background screen streaming with a ring buffer of recent frames
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import TYPE_CHECKING, List, Optional
+
+from .framebuffer import Framebuffer
+
+if TYPE_CHECKING:
+    from .adb_client import ADBClient
+
+# Seconds next_frame and wait_for_change wait by default
+FRAME_TIMEOUT = 10.0
+
+
+class ScreenStream:
+    """
+    Continuously capture raw frames from a device in the background.
+
+    The newest ``buffer_size`` frames are kept with their capture
+    timestamps, so readers get the current screen without waiting for a
+    fresh capture.
+    """
+
+    def __init__(self, adb_client: "ADBClient", buffer_size: int = 4, interval: float = 0.0):
+        """
+        Initialize the stream.
+
+        Args:
+            adb_client: Client for the device to capture
+            buffer_size: Number of recent frames to keep
+            interval: Minimum delay in seconds between captures
+        """
+        self.adb_client = adb_client
+        self.interval = interval
+        self.frames: deque = deque(maxlen=buffer_size)
+        self.errors = 0
+        self._task: Optional[asyncio.Task] = None
+        self._new_frame: Optional[asyncio.Condition] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start capturing in a background task."""
+        if self.running:
+            return
+        self._new_frame = asyncio.Condition()
+        self._task = asyncio.ensure_future(self._capture_loop())
+
+    async def stop(self) -> None:
+        """Stop capturing."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            # Wake waiters so they fail instead of waiting for frames that never come
+            async with self._new_frame:
+                self._new_frame.notify_all()
+
+    async def _capture_loop(self) -> None:
+        while True:
+            try:
+                frame = await self.adb_client.screenshotRaw()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.errors += 1
+                await asyncio.sleep(max(self.interval, 0.5))
+                continue
+            self.frames.append(frame)
+            async with self._new_frame:
+                self._new_frame.notify_all()
+            if self.interval:
+                await asyncio.sleep(self.interval)
+
+    def latest(self, max_age: Optional[float] = None) -> Optional[Framebuffer]:
+        """
+        Return the newest frame.
+
+        Args:
+            max_age: Ignore the frame if it is older than this many seconds
+
+        Returns:
+            The newest Framebuffer, or None if there is no fresh frame
+        """
+        if not self.frames:
+            return None
+        frame = self.frames[-1]
+        if max_age is not None and time.time() - frame.timestamp > max_age:
+            return None
+        return frame
+
+    def recent(self) -> List[Framebuffer]:
+        """All buffered frames, oldest first."""
+        return list(self.frames)
+
+    async def next_frame(self, after: float, timeout: Optional[float] = FRAME_TIMEOUT) -> Framebuffer:
+        """
+        Wait for a frame captured after the given timestamp.
+
+        Args:
+            after: Timestamp (time.time()) the frame must be newer than
+            timeout: Seconds to wait, or None to wait forever
+
+        Raises:
+            RuntimeError: If the stream is not running or stops while waiting
+            asyncio.TimeoutError: If no new frame arrives in time
+        """
+        if not self.running:
+            raise RuntimeError("Screen stream is not running")
+
+        async def wait() -> Framebuffer:
+            async with self._new_frame:
+                while not self.frames or self.frames[-1].timestamp <= after:
+                    if not self.running:
+                        raise RuntimeError("Screen stream stopped")
+                    await self._new_frame.wait()
+                return self.frames[-1]
+
+        return await asyncio.wait_for(wait(), timeout)
+
+    async def wait_for_change(self, reference: Optional[Framebuffer] = None, timeout: Optional[float] = FRAME_TIMEOUT, ignore_top_rows: int = 0) -> Framebuffer:
+        """
+        Wait until the screen differs from a reference frame.
+
+        Args:
+            reference: Frame to compare against, defaults to the newest frame
+            timeout: Seconds to wait, or None to wait forever
+            ignore_top_rows: Rows to skip when comparing (e.g. the status bar clock)
+
+        Returns:
+            The first frame that differs from the reference
+
+        Raises:
+            RuntimeError: If the stream is not running or stops while waiting
+            asyncio.TimeoutError: If the screen does not change in time
+        """
+        reference = reference or self.latest()
+        if reference is None:
+            return await self.next_frame(0.0, timeout)
+
+        async def wait() -> Framebuffer:
+            frame = reference
+            while True:
+                frame = await self.next_frame(frame.timestamp, None)
+                if _frames_differ(reference, frame, ignore_top_rows):
+                    return frame
+
+        return await asyncio.wait_for(wait(), timeout)
+
+
+def _frames_differ(a: Framebuffer, b: Framebuffer, ignore_top_rows: int = 0) -> bool:
+    if (a.width, a.height, a.pixel_format) != (b.width, b.height, b.pixel_format):
+        return True
+    skip = ignore_top_rows * a.width * a.bytes_per_pixel
+    return a.pixels[skip:] != b.pixels[skip:]
@@ -0,0 +1,180 @@
+"""
+Persistent, multiplexed ``adb shell`` sessions
+"""
+
+import asyncio
+import itertools
+from typing import Dict, List, Optional
+
+_CHUNK_SIZE = 65536
+
+
+class ShellSession:
+    """
+    A long-lived ``adb shell`` process that runs commands one after another.
+
+    Each command is wrapped so that the device shell prints a unique sentinel
+    (followed by the exit code) on stdout and stderr once it finishes. Output
+    is read up to the sentinel, so the same process can be reused for every
+    command instead of forking a new ``adb`` for each one.
+
+    Without shell protocol v2 (old devices or adb servers) adb merges the
+    device's stderr into stdout. This is detected when the shell starts; in
+    that case only the stdout sentinel is used and 'stderr' is always empty.
+    """
+
+    _counter = itertools.count()
+
+    def __init__(self, adb_path: str = "adb", adb_args: Optional[List[str]] = None, timeout: float = 30.0):
+        """
+        Initialize the session. The shell process is started lazily.
+
+        Args:
+            adb_path: Path to the adb binary
+            adb_args: Extra global adb arguments placed before ``shell``
+            timeout: Seconds to wait for a single command to complete
+        """
+        self.adb_path = adb_path
+        self.adb_args = list(adb_args or [])
+        self.timeout = timeout
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._lock = asyncio.Lock()
+        self._stdout_buffer = bytearray()
+        self._stderr_buffer = bytearray()
+        # Whether the device's stderr arrives on our stdout (no shell_v2)
+        self.merged_stderr = False
+
+    @property
+    def running(self) -> bool:
+        """Whether the underlying shell process is alive."""
+        return self._process is not None and self._process.returncode is None
+
+    async def start(self) -> None:
+        """Start the shell process if it is not already running."""
+        if self.running:
+            return
+        self._stdout_buffer.clear()
+        self._stderr_buffer.clear()
+        self._process = await asyncio.create_subprocess_exec(
+            self.adb_path, *self.adb_args, "shell",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            await asyncio.wait_for(self._detect_merged_stderr(), timeout=self.timeout)
+        except (asyncio.TimeoutError, ConnectionError, EOFError):
+            await self._kill()
+            raise RuntimeError("Could not start adb shell session")
+
+    async def _detect_merged_stderr(self) -> None:
+        """Check whether stderr written on the device shows up on stdout."""
+        token = f"__MANUS_MOBILE_PROBE_{next(self._counter)}__"
+        # stderr is written first, so on a merged stream it precedes the stdout marker
+        self._process.stdin.write(f"printf '{token}:err\\n' >&2; printf '{token}:out\\n'\n".encode("utf-8"))
+        await self._process.stdin.drain()
+        stdout, _ = await self._read_until(self._process.stdout, self._stdout_buffer, f"{token}:out\n".encode())
+        self.merged_stderr = f"{token}:err".encode() in stdout
+        if not self.merged_stderr:
+            await self._read_until(self._process.stderr, self._stderr_buffer, f"{token}:err\n".encode())
+
+    async def close(self) -> None:
+        """Terminate the shell process."""
+        process, self._process = self._process, None
+        if process is None or process.returncode is not None:
+            return
+        try:
+            process.stdin.write(b"exit\n")
+            await process.stdin.drain()
+            await asyncio.wait_for(process.wait(), timeout=2.0)
+        except (asyncio.TimeoutError, ConnectionError):
+            process.kill()
+            await process.wait()
+
+    async def run(self, command: str) -> Dict[str, str]:
+        """
+        Run a command on the device and wait for it to finish.
+
+        Args:
+            command: The shell command line to run on the device
+
+        Returns:
+            Dictionary with 'stdout', 'stderr' and 'exit_code'
+        """
+        async with self._lock:
+            if not self.running:
+                await self.start()
+            try:
+                return await asyncio.wait_for(self._run(command), timeout=self.timeout)
+            except (asyncio.TimeoutError, ConnectionError, EOFError) as e:
+                # The session is in an unknown state; drop it so the next
+                # command starts from a fresh shell.
+                await self._kill()
+                if isinstance(e, asyncio.TimeoutError):
+                    raise RuntimeError(f"Shell command timed out after {self.timeout}s: {command}")
+                raise RuntimeError(f"Shell session terminated while running: {command}")
+            except asyncio.CancelledError:
+                # The command's output would be read as the next one's
+                await self._kill()
+                raise
+
+    async def _run(self, command: str) -> Dict[str, str]:
+        token = f"__MANUS_MOBILE_{next(self._counter)}__"
+        # Group the command so that pipes and ';' work, and detach its stdin so
+        # it cannot swallow the lines that follow.
+        script = (
+            f"{{ {command}\n}} </dev/null\n"
+            f"printf '\\n{token}:%d\\n' $?\n"
+        )
+        if not self.merged_stderr:
+            script += f"printf '\\n{token}\\n' >&2\n"
+        self._process.stdin.write(script.encode("utf-8"))
+        await self._process.stdin.drain()
+
+        stdout_marker = f"\n{token}:".encode()
+        stdout, tail = await self._read_until(self._process.stdout, self._stdout_buffer, stdout_marker, b"\n")
+        stderr = b""
+        if not self.merged_stderr:
+            stderr, _ = await self._read_until(self._process.stderr, self._stderr_buffer, f"\n{token}\n".encode())
+
+        return {
+            "stdout": stdout.decode("utf-8", errors="replace"),
+            "stderr": stderr.decode("utf-8", errors="replace"),
+            "exit_code": int(tail.strip() or 0)
+        }
+
+    async def _read_until(self, stream: asyncio.StreamReader, buffer: bytearray, marker: bytes, terminator: bytes = b""):
+        """
+        Read from stream until marker (and optionally a terminator after it).
+
+        Returns the bytes before the marker and the bytes between the marker
+        and the terminator. Anything after is kept in the buffer.
+        """
+        search_from = 0
+        while True:
+            index = buffer.find(marker, search_from)
+            if index != -1:
+                end = index + len(marker)
+                if terminator:
+                    stop = buffer.find(terminator, end)
+                    if stop != -1:
+                        data, tail = bytes(buffer[:index]), bytes(buffer[end:stop])
+                        del buffer[:stop + len(terminator)]
+                        return data, tail
+                else:
+                    data = bytes(buffer[:index])
+                    del buffer[:end]
+                    return data, b""
+            else:
+                search_from = max(0, len(buffer) - len(marker))
+
+            chunk = await stream.read(_CHUNK_SIZE)
+            if not chunk:
+                raise EOFError("adb shell closed unexpectedly")
+            buffer.extend(chunk)
+
+    async def _kill(self) -> None:
+        process, self._process = self._process, None
+        if process is not None and process.returncode is None:
+            process.kill()
+            await process.wait()
@@ -0,0 +1,148 @@
+"""
+Text entry that picks the fastest correct method for the text
+"""
+
+import base64
+import shlex
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from .adb_client import ADBClient
+
+# ADBKeyboard (https://github.com/senzhk/ADBKeyBoard) accepts text over a broadcast
+ADB_KEYBOARD_IME = "com.android.adbkeyboard/.AdbIME"
+
+# Characters `input text` cannot send, entered as key events instead
+_KEY_CHARACTERS = {"\n": "KEYCODE_ENTER", "\t": "KEYCODE_TAB"}
+
+
+def ascii_text_commands(text: str, chunk_size: int = 64) -> List[str]:
+    """
+    Build ``input`` commands that type printable ASCII text.
+
+    Text is split into chunks of at most chunk_size characters; newlines and
+    tabs become key events. Each chunk is quoted for the device shell and
+    spaces are sent as ``%s``, which ``input text`` turns back into spaces.
+
+    Args:
+        text: ASCII text to type
+        chunk_size: Maximum characters per ``input text`` call
+
+    Returns:
+        The commands, in order
+    """
+    commands = []
+    segment = []
+
+    def flush() -> None:
+        value = "".join(segment)
+        for start in range(0, len(value), chunk_size):
+            chunk = value[start:start + chunk_size].replace(" ", "%s")
+            commands.append(f"input text {shlex.quote(chunk)}")
+        segment.clear()
+
+    for char in text:
+        if char in _KEY_CHARACTERS:
+            flush()
+            commands.append(f"input keyevent {_KEY_CHARACTERS[char]}")
+        else:
+            segment.append(char)
+    flush()
+    return commands
+
+
+def needs_ime(text: str) -> bool:
+    """Whether text contains characters ``input text`` cannot type."""
+    return any(not (" " <= char <= "~" or char in _KEY_CHARACTERS) for char in text)
+
+
+class TextInput:
+    """
+    Type text on a device using the fastest method that is correct for it.
+
+    Printable ASCII goes through chunked ``input text`` calls sent in one
+    round trip. Anything else (CJK, emoji, accents) is delivered in a single
+    base64 broadcast to ADBKeyboard, switching to it and back when it is not
+    the current input method. Throughput is tracked per method.
+    """
+
+    def __init__(self, adb_client: "ADBClient", chunk_size: int = 64, ime_switch_delay: float = 0.3):
+        """
+        Initialize text input.
+
+        Args:
+            adb_client: Client for the device
+            chunk_size: Maximum characters per ``input text`` call
+            ime_switch_delay: Seconds to let ADBKeyboard bind after switching to it
+        """
+        self.adb_client = adb_client
+        self.chunk_size = chunk_size
+        self.ime_switch_delay = ime_switch_delay
+        self._ime_state: Optional[Dict[str, Any]] = None
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    async def _probe_ime(self) -> Dict[str, Any]:
+        """Check once whether ADBKeyboard is installed and which IME is active."""
+        if self._ime_state is None:
+            result = await self.adb_client.shell("ime list -a -s; echo; settings get secure default_input_method")
+            lines = result["stdout"].split()
+            self._ime_state = {
+                "available": ADB_KEYBOARD_IME in lines[:-1],
+                "current": lines[-1] if lines else None,
+            }
+        return self._ime_state
+
+    async def type(self, text: str) -> Dict[str, str]:
+        """
+        Type text, choosing the method automatically.
+
+        Args:
+            text: The text to type
+
+        Returns:
+            The shell result with the method used under 'method'
+        """
+        if not text:
+            return {"stdout": "", "stderr": "", "exit_code": 0, "method": "none"}
+        method = "adb_keyboard" if needs_ime(text) else "input_text"
+        command = await self.command_for(text)
+
+        start = time.perf_counter()
+        result = await self.adb_client.shell(command)
+        self._record(method, len(text), time.perf_counter() - start)
+        return {**result, "method": method}
+
+    async def command_for(self, text: str) -> str:
+        """Shell command that types text with the method type() would choose."""
+        if not needs_ime(text):
+            return " && ".join(ascii_text_commands(text, self.chunk_size))
+        state = await self._probe_ime()
+        if not state["available"]:
+            raise RuntimeError(
+                f"Typing non-ASCII text requires ADBKeyboard ({ADB_KEYBOARD_IME}) to be installed on the device"
+            )
+        message = base64.b64encode(text.encode("utf-8")).decode("ascii")
+        broadcast = f"am broadcast -a ADB_INPUT_B64 --es msg {message}"
+        if state["current"] == ADB_KEYBOARD_IME:
+            return broadcast
+        # Switch to ADBKeyboard for this text only and always switch back; the
+        # subshell keeps `exit` from ending a persistent shell session
+        return (
+            f"(ime enable {ADB_KEYBOARD_IME} >/dev/null && ime set {ADB_KEYBOARD_IME} >/dev/null"
+            f" && sleep {self.ime_switch_delay:g} && {broadcast}; status=$?;"
+            f" ime set {shlex.quote(state['current'])} >/dev/null; exit $status)"
+        )
+
+    def _record(self, method: str, characters: int, seconds: float) -> None:
+        stats = self._stats.setdefault(method, {"calls": 0, "characters": 0, "seconds": 0.0})
+        stats["calls"] += 1
+        stats["characters"] += characters
+        stats["seconds"] += seconds
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Calls, characters, seconds and characters per second for each method."""
+        return {
+            method: {**stats, "chars_per_second": stats["characters"] / stats["seconds"] if stats["seconds"] else 0.0}
+            for method, stats in self._stats.items()
+        }
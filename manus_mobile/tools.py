@@ -2,6 +2,7 @@
 Tool providers and utilities for manus_mobile
 """
 
+import asyncio
 from typing import Dict, Any, List
 from .adb_client import ADBClient
 from .mobile_computer import MobileComputer
@@ -9,10 +10,12 @@ from .mobile_computer import MobileComputer
 class MobileToolProvider:
     """Provider for mobile automation tools."""
     
-    def __init__(self, adb_client: ADBClient, mobile_computer: MobileComputer = None):
+    def __init__(self, adb_client: ADBClient, mobile_computer: MobileComputer = None, app_launch_timeout: float = 10.0):
         """Initialize with an ADB client and optional mobile computer."""
         self.adb_client = adb_client
         self.mobile_computer = mobile_computer
+        # Seconds open_app waits for the app to come to the front when the foreground watcher runs
+        self.app_launch_timeout = app_launch_timeout
         self.tools = {}
         self._setup_tools()
     
@@ -40,46 +43,25 @@ class MobileToolProvider:
             self.tools["mobile_computer"] = {
                 "name": "mobile_computer",
                 "description": "Mobile tool to perform actions on a mobile device.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "action": {
-                            "type": "string",
-                            "enum": ["dump_ui", "tap", "swipe", "type", "press", "screenshot"],
-                            "description": "The action to perform on the mobile device"
-                        },
-                        "coordinate": {
-                            "type": "array",
-                            "items": {"type": "integer"},
-                            "description": "The x, y coordinates for tapping on the screen"
-                        },
-                        "start_coordinate": {
-                            "type": "array",
-                            "items": {"type": "integer"},
-                            "description": "The starting x, y coordinates for a swipe gesture"
-                        },
-                        "end_coordinate": {
-                            "type": "array",
-                            "items": {"type": "integer"},
-                            "description": "The ending x, y coordinates for a swipe gesture"
-                        },
-                        "text": {
-                            "type": "string",
-                            "description": "Text to type or a key to press"
-                        },
-                        "duration": {
-                            "type": "integer",
-                            "description": "Duration for operations like swipes in milliseconds"
-                        }
-                    },
-                    "required": ["action"]
-                },
+                # Share the parameter schema so both tool descriptions stay in sync
+                "parameters": self.mobile_computer.get_tool_description()["function"]["parameters"],
                 "function": self._mobile_computer
             }
     
     async def _open_app(self, name: str) -> str:
         """Open the specified app by package name."""
         await self.adb_client.openApp(name)
+        if self.mobile_computer:
+            self.mobile_computer.invalidate_ui_cache()
+            if self.mobile_computer.recorder is not None:
+                self.mobile_computer.recorder.record_open_app(name)
+        watcher = self.adb_client.app_watcher
+        if watcher.running:
+            # Return once the app is actually in front instead of right after launch
+            try:
+                await watcher.wait_for(package=name, timeout=self.app_launch_timeout)
+            except asyncio.TimeoutError:
+                return f"Opened {name}, but it is not in the foreground yet"
         return f"Successfully opened {name}"
     
     async def _mobile_computer(self, **kwargs) -> str:
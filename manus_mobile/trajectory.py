@@ -0,0 +1,299 @@
+"""
+Trajectory recording and LLM-free replay of mobile actions
+"""
+
+import asyncio
+import json
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .agent import MobileAgent
+from .llm_cache import normalize_text
+from .ui_tree import UINode, UITree
+
+if TYPE_CHECKING:
+    from .adb_client import ADBClient
+    from .mobile_computer import MobileComputer
+    from .tools import MobileToolProvider
+
+# Attributes that identify an anchor element, most specific first
+ANCHOR_ATTRS = ("resource-id", "content-desc", "text")
+
+
+def _node_attrs(node: UINode) -> Dict[str, str]:
+    return {
+        "resource-id": node.resource_id,
+        "content-desc": node.content_desc,
+        "text": node.text,
+        "class": node.class_name
+    }
+
+
+async def foreground(adb_client: "ADBClient") -> Optional[str]:
+    """The foreground activity as package/fully.qualified.Activity, or None if unknown."""
+    app = await adb_client.getCurrentApp()
+    component = app.get("focusedApp") or app.get("currentFocus")
+    if not component or "/" not in component:
+        return None
+    package, activity = component.split("/", 1)
+    return f"{package}/{package + activity if activity.startswith('.') else activity}"
+
+
+def make_anchor(tree: UITree, x: int, y: int) -> Optional[Dict[str, Any]]:
+    """
+    Describe the element under a point so it can be found again later.
+
+    The topmost element at the point with a resource-id, content-desc or
+    text is used; the anchor keeps its identifying attributes, its bounds
+    and where inside the bounds the point was.
+
+    Args:
+        tree: The UI hierarchy before the action
+        x: Horizontal coordinate in pixels
+        y: Vertical coordinate in pixels
+
+    Returns:
+        The anchor, or None if no identifiable element is under the point
+    """
+    for node in tree.spatial_index.elements_at(x, y):
+        attrs = _node_attrs(node)
+        if not any(attrs[attr] for attr in ANCHOR_ATTRS):
+            continue
+        left, top, right, bottom = node.bounds
+        return {
+            **attrs,
+            "bounds": [left, top, right, bottom],
+            "offset": [
+                (x - left) / max(right - left, 1),
+                (y - top) / max(bottom - top, 1)
+            ]
+        }
+    return None
+
+
+def resolve_anchor(tree: UITree, anchor: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """
+    Find an anchor in a fresh hierarchy and return the point to act on.
+
+    Candidates must match every recorded identifying attribute (text is
+    compared with numbers normalized); the one closest to the recorded
+    position wins.
+
+    Args:
+        tree: The current UI hierarchy
+        anchor: An anchor from make_anchor
+
+    Returns:
+        (x, y) inside the matching element, or None if the screen does not match
+    """
+    lookup = next(attr for attr in ANCHOR_ATTRS if anchor.get(attr))
+    value = anchor[lookup]
+    if lookup == "text" and normalize_text(value) != value:
+        nodes = list(tree)
+    else:
+        nodes = tree.element_index.find(lookup, value, exact_match=True)
+
+    candidates = []
+    for node in nodes:
+        attrs = _node_attrs(node)
+        if attrs["class"] != anchor.get("class") or node.bounds is None:
+            continue
+        if any(normalize_text(attrs[attr]) != normalize_text(anchor.get(attr) or "") for attr in ANCHOR_ATTRS):
+            continue
+        candidates.append(node)
+    if not candidates:
+        return None
+
+    recorded = anchor["bounds"]
+    center = ((recorded[0] + recorded[2]) / 2, (recorded[1] + recorded[3]) / 2)
+
+    def distance(node: UINode) -> float:
+        cx, cy = node.center
+        return (cx - center[0]) ** 2 + (cy - center[1]) ** 2
+
+    left, top, right, bottom = min(candidates, key=distance).bounds
+    fx, fy = anchor["offset"]
+    return (
+        min(right - 1, left + round(fx * (right - left))),
+        min(bottom - 1, top + round(fy * (bottom - top)))
+    )
+
+
+class TrajectoryRecorder:
+    """
+    Record the input actions a MobileComputer executes.
+
+    Every tap, swipe, type, press and batch is stored with its parameters
+    and the foreground activity it ran in; taps (and swipe starts) also get
+    an anchor describing the element they hit, taken from the computer's
+    last UI hierarchy (the one the action was chosen on). Attach with ``attach(computer)``; ``open_app``
+    calls made through MobileToolProvider are recorded too.
+    """
+
+    def __init__(self):
+        self.steps: List[Dict[str, Any]] = []
+
+    def attach(self, computer: "MobileComputer") -> "TrajectoryRecorder":
+        computer.recorder = self
+        return self
+
+    def detach(self, computer: "MobileComputer") -> None:
+        if computer.recorder is self:
+            computer.recorder = None
+
+    async def record(self, computer: "MobileComputer", params: Dict[str, Any], perform: Callable[[], Awaitable[Any]]) -> Any:
+        """Capture anchors, run the action and keep the step if it succeeded."""
+        step = {key: value for key, value in params.items() if value is not None}
+        step["foreground"] = await foreground(computer.adb_client)
+        point = params.get("coordinate") or params.get("start_coordinate")
+        if point and params["action"] in ("tap", "swipe"):
+            # The hierarchy the decision was based on; dump only if there is none
+            tree = computer.last_tree or await computer.get_ui_tree()
+            step["anchor"] = make_anchor(tree, *point)
+
+        result = await perform()
+        if not (isinstance(result, str) and result.startswith("Error")):
+            step["time"] = time.time()
+            self.steps.append(step)
+        return result
+
+    def record_open_app(self, package: str) -> None:
+        self.steps.append({"action": "open_app", "text": package, "time": time.time()})
+
+    def to_json(self) -> str:
+        return json.dumps({"version": 1, "steps": self.steps}, ensure_ascii=False, indent=2)
+
+    def save(self, path: str) -> None:
+        """Write the trajectory to a JSON file."""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_json())
+
+
+def load_trajectory(path: str) -> List[Dict[str, Any]]:
+    """Read the steps of a trajectory saved by TrajectoryRecorder.save."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["steps"]
+
+
+class TrajectoryReplayer:
+    """
+    Replay recorded steps at device speed without the LLM.
+
+    Before each step the foreground activity must match the recorded one,
+    and anchored steps are re-resolved against fresh UI dumps; the replayer
+    waits up to settle_timeout for that while the previous screen is still
+    showing. When another activity comes up, or the wait times out, the
+    screen has diverged from the recording: the replayer then hands the
+    task to a MobileAgent if an LLM function was given, or raises.
+    Recording on the computer is paused during a replay.
+    """
+
+    def __init__(self, tool_provider: "MobileToolProvider", llm_function: Optional[Callable] = None, settle_timeout: float = 5.0, poll_interval: float = 0.2, fallback_steps: int = 20):
+        """
+        Initialize the replayer.
+
+        Args:
+            tool_provider: Tool provider whose MobileComputer drives the device
+            llm_function: LLM to fall back to when the screen does not match
+            settle_timeout: Seconds to wait for a step's screen to appear
+            poll_interval: Seconds between dumps while waiting
+            fallback_steps: max_steps of the fallback agent
+        """
+        self.tool_provider = tool_provider
+        self.computer = tool_provider.mobile_computer
+        self.llm_function = llm_function
+        self.settle_timeout = settle_timeout
+        self.poll_interval = poll_interval
+        self.fallback_steps = fallback_steps
+
+    async def _settle(self, step: Dict[str, Any], previous: Optional[str]) -> Tuple[bool, Optional[Tuple[int, int]]]:
+        """
+        Wait until the screen matches a step.
+
+        Returns whether it matched and, for anchored steps, the point to act
+        on. Waiting continues only while the foreground is still `previous`
+        (the screen the last action left) or unknown; previous=None tolerates
+        any foreground until the timeout.
+        """
+        expected = step.get("foreground")
+        anchor = step.get("anchor")
+        deadline = time.monotonic() + self.settle_timeout
+        while True:
+            current = await foreground(self.computer.adb_client) if expected else None
+            if current == expected:
+                if anchor is None:
+                    return True, None
+                point = resolve_anchor(await self.computer.get_ui_tree(), anchor)
+                if point is not None:
+                    return True, point
+            elif current is not None and previous is not None and current != previous:
+                # Neither the expected screen nor the one being left
+                return False, None
+            if time.monotonic() >= deadline:
+                return False, None
+            await asyncio.sleep(self.poll_interval)
+            self.computer.invalidate_ui_cache()
+
+    async def replay(self, steps: List[Dict[str, Any]], task: Optional[str] = None, system_prompt: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Replay steps in order.
+
+        Args:
+            steps: Steps from TrajectoryRecorder (or load_trajectory)
+            task: The original task, needed for the LLM fallback
+            system_prompt: System prompt for the fallback agent
+
+        Returns:
+            Dictionary with 'replayed' step count, 'fallback' (whether the
+            LLM took over), 'response' of the fallback agent and 'seconds'
+        """
+        started = time.perf_counter()
+        # Replayed actions must not be recorded into a trajectory being captured
+        recorder, self.computer.recorder = self.computer.recorder, None
+        try:
+            return await self._replay(steps, task, system_prompt, started)
+        finally:
+            self.computer.recorder = recorder
+
+    async def _replay(self, steps: List[Dict[str, Any]], task: Optional[str], system_prompt: Optional[str], started: float) -> Dict[str, Any]:
+        previous = None
+        for i, step in enumerate(steps):
+            params = {key: value for key, value in step.items() if key not in ("anchor", "foreground", "time")}
+            action = params.pop("action")
+
+            if action == "open_app":
+                await self.tool_provider.execute_tool("open_app", name=params["text"])
+                previous = None
+                continue
+
+            matched, point = await self._settle(step, previous)
+            if not matched:
+                return await self._fall_back(i, step, task, system_prompt, started)
+            previous = step.get("foreground")
+            if point is not None:
+                if action == "tap":
+                    params["coordinate"] = list(point)
+                else:
+                    # Move the whole swipe with its start
+                    dx = point[0] - params["start_coordinate"][0]
+                    dy = point[1] - params["start_coordinate"][1]
+                    params["start_coordinate"] = list(point)
+                    params["end_coordinate"] = [params["end_coordinate"][0] + dx, params["end_coordinate"][1] + dy]
+
+            result = await self.computer.execute(action, observation="none", **params)
+            if isinstance(result, str) and result.startswith("Error"):
+                raise RuntimeError(f"Replay step {i} ({action}) failed: {result}")
+
+        return {"replayed": len(steps), "fallback": False, "response": None, "seconds": time.perf_counter() - started}
+
+    async def _fall_back(self, index: int, step: Dict[str, Any], task: Optional[str], system_prompt: Optional[str], started: float) -> Dict[str, Any]:
+        if self.llm_function is None or task is None:
+            raise RuntimeError(f"Replay step {index} ({step['action']}): screen does not match the recording")
+        from .core import MOBILE_USE_PROMPT
+
+        agent = MobileAgent(self.tool_provider, self.llm_function, max_steps=self.fallback_steps)
+        response = await agent.run(
+            f"{task}\n\nThe first {index} steps of this task have already been done on the device. Continue from the current screen.",
+            system_prompt or MOBILE_USE_PROMPT
+        )
+        return {"replayed": index, "fallback": True, "response": response, "seconds": time.perf_counter() - started}
@@ -0,0 +1,105 @@
+"""
+Incremental diffs between consecutive UI hierarchy dumps
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+# Attributes compared between matched nodes
+COMPARED_ATTRS = (
+    "text", "content-desc", "bounds", "checked", "clickable", "enabled",
+    "focused", "scrollable", "selected",
+)
+
+
+def node_keys(ui_data: Dict[str, Any]) -> List[Tuple[str, Optional[str], Dict[str, Any]]]:
+    """
+    Assign a stable key to every node of a parsed hierarchy.
+
+    A key is the path of short class names from the root, each step tagged
+    with the node's resource-id and, when siblings share class and id, its
+    position among them, e.g. ``FrameLayout/ListView#list/TextView#title[2]``.
+
+    Args:
+        ui_data: The parsed UI hierarchy
+
+    Returns:
+        (key, parent_key, node) for every node in document order
+    """
+    result = []
+    stack: List[Tuple[Dict[str, Any], str, Optional[str]]] = [(ui_data, "", None)]
+    while stack:
+        node, key, parent_key = stack.pop()
+        result.append((key, parent_key, node))
+        seen: Dict[str, int] = {}
+        children = []
+        for child in node.get("children", []):
+            step = child.get("class", "").rsplit(".", 1)[-1] or "node"
+            if child.get("resource-id"):
+                step += "#" + child["resource-id"].rsplit("/", 1)[-1]
+            occurrence = seen.get(step, 0)
+            seen[step] = occurrence + 1
+            if occurrence:
+                step += f"[{occurrence}]"
+            children.append((child, f"{key}/{step}" if key else step, key))
+        stack.extend(reversed(children))
+    return result
+
+
+def diff_ui(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compute a compact delta between two parsed UI hierarchies.
+
+    Nodes are matched by their stable key (see node_keys). For matched nodes
+    only attributes in COMPARED_ATTRS that differ are reported. New subtrees
+    are reported once at their root, and removed subtrees by their root key.
+
+    Args:
+        old: The previous parsed hierarchy
+        new: The current parsed hierarchy
+
+    Returns:
+        A dictionary with 'changed', 'added', 'removed' and 'unchanged' count
+    """
+    old_entries = node_keys(old)
+    old_nodes = {key: node for key, _, node in old_entries}
+    new_entries = node_keys(new)
+    new_keys = {key for key, _, _ in new_entries}
+
+    changed = []
+    added = []
+    unchanged = 0
+    for key, parent_key, node in new_entries:
+        previous = old_nodes.get(key)
+        if previous is None:
+            # Report a new subtree once, at its topmost added node
+            if parent_key is None or parent_key in old_nodes:
+                added.append({"key": key, "node": node})
+            continue
+        attrs = {
+            attr: node.get(attr)
+            for attr in COMPARED_ATTRS
+            if node.get(attr) != previous.get(attr)
+        }
+        if attrs:
+            changed.append({"key": key, "attrs": attrs})
+        else:
+            unchanged += 1
+
+    removed = [
+        key for key, parent_key, _ in old_entries
+        if key not in new_keys and (parent_key is None or parent_key in new_keys)
+    ]
+
+    return {
+        "type": "ui_diff",
+        "changed": changed,
+        "added": added,
+        "removed": removed,
+        "unchanged": unchanged
+    }
+
+
+def is_small_diff(delta: Dict[str, Any], max_ratio: float = 0.5) -> bool:
+    """Whether a delta is worth sending instead of the full hierarchy."""
+    touched = len(delta["changed"]) + len(delta["added"]) + len(delta["removed"])
+    return touched <= max_ratio * (touched + delta["unchanged"])
@@ -1,10 +1,17 @@
+import io
+import re
 import xml.etree.ElementTree as ET
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterator, List, Any, Optional, Sequence, Tuple, Union
 
-def parse_ui_dump(xml_data: str) -> Dict[str, Any]:
+_BOUNDS_PATTERN = re.compile(r"\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]")
+
+def parse_ui_dump(xml_data: Union[str, bytes]) -> Dict[str, Any]:
     """
     Parse Android UI dump XML into a structured JSON format.
     
+    The tree is built in a single streaming pass (see iter_ui_nodes), so
+    large dumps never exist twice in memory as XML elements and dicts.
+    
     Args:
         xml_data: The XML string from uiautomator dump
         
@@ -12,11 +19,74 @@ def parse_ui_dump(xml_data: str) -> Dict[str, Any]:
         A dictionary representation of the UI hierarchy
     """
     try:
-        root = ET.fromstring(xml_data)
-        return parse_node(root)
+        nodes: List[Dict[str, Any]] = []
+        for parent, attrib, bounds in iter_ui_nodes(xml_data):
+            node: Dict[str, Any] = attrib
+            if bounds is not None:
+                node["bounds"] = bounds_to_dict(bounds)
+            if parent >= 0:
+                nodes[parent].setdefault("children", []).append(node)
+            nodes.append(node)
+        if not nodes:
+            raise ValueError("empty document")
+        return nodes[0]
     except Exception as e:
         raise ValueError(f"Failed to parse UI dump: {str(e)}")
 
+def iter_ui_nodes(xml_data: Union[str, bytes]) -> Iterator[Tuple[int, Dict[str, str], Optional[Tuple[int, int, int, int]]]]:
+    """
+    Incrementally walk a UI dump in document order.
+    
+    Each XML element is dropped as soon as it has been read, so memory stays
+    flat regardless of the dump size.
+    
+    Args:
+        xml_data: The XML string (or bytes) from uiautomator dump
+        
+    Yields:
+        (parent_index, attributes, bounds) for every element, where
+        parent_index is the position of the parent in the yielded sequence
+        (-1 for the root), attributes excludes "bounds", and bounds is a
+        (left, top, right, bottom) tuple or None
+    """
+    if isinstance(xml_data, str):
+        xml_data = xml_data.encode("utf-8")
+    
+    index = 0
+    parents: List[int] = []
+    elements: List[ET.Element] = []
+    for event, element in ET.iterparse(io.BytesIO(xml_data), events=("start", "end")):
+        if event == "start":
+            attrib = dict(element.attrib)
+            bounds_str = attrib.pop("bounds", None)
+            bounds = _parse_bounds_tuple(bounds_str) if bounds_str is not None else None
+            yield (parents[-1] if parents else -1), attrib, bounds
+            parents.append(index)
+            elements.append(element)
+            index += 1
+        else:
+            parents.pop()
+            elements.pop()
+            element.clear()
+            # Children finish in order, so this is the parent's first child
+            if elements:
+                elements[-1].remove(element)
+
+def _parse_bounds_tuple(bounds_str: str) -> Tuple[int, int, int, int]:
+    match = _BOUNDS_PATTERN.match(bounds_str)
+    if not match:
+        raise ValueError(f"Failed to parse bounds '{bounds_str}': Invalid bounds format: {bounds_str}")
+    return tuple(int(value) for value in match.groups())
+
+def bounds_to_dict(bounds: Tuple[int, int, int, int]) -> Dict[str, int]:
+    """Convert a (left, top, right, bottom) tuple into a bounds dictionary."""
+    return {
+        "left": bounds[0],
+        "top": bounds[1],
+        "right": bounds[2],
+        "bottom": bounds[3]
+    }
+
 def parse_node(node: ET.Element) -> Dict[str, Any]:
     """
     Recursively parse an XML node into a dictionary.
@@ -60,21 +130,7 @@ def parse_bounds(bounds_str: str) -> Dict[str, int]:
     Returns:
         A dictionary with left, top, right, bottom coordinates
     """
-    try:
-        # Remove brackets and split by ][
-        parts = bounds_str.replace("[", "").replace("]", "").split(",")
-        
-        if len(parts) >= 4:
-            return {
-                "left": int(parts[0]),
-                "top": int(parts[1]),
-                "right": int(parts[2]),
-                "bottom": int(parts[3])
-            }
-        else:
-            raise ValueError(f"Invalid bounds format: {bounds_str}")
-    except Exception as e:
-        raise ValueError(f"Failed to parse bounds '{bounds_str}': {str(e)}")
+    return bounds_to_dict(_parse_bounds_tuple(bounds_str))
 
 def get_element_center(bounds: Dict[str, int]) -> Dict[str, int]:
     """
@@ -91,54 +147,371 @@ def get_element_center(bounds: Dict[str, int]) -> Dict[str, int]:
         "y": (bounds["top"] + bounds["bottom"]) // 2
     }
 
-def find_elements_by_text(ui_data: Dict[str, Any], text: str, exact_match: bool = False) -> List[Dict[str, Any]]:
+def find_elements_by_text(ui_data: Union[Dict[str, Any], "ElementIndex"], text: str, exact_match: bool = False) -> List[Dict[str, Any]]:
     """
     Find UI elements by their text content.
     
     Args:
-        ui_data: The parsed UI hierarchy
+        ui_data: The parsed UI hierarchy, or an ElementIndex built from it
+                 (ElementIndex.from_ui_data) when looking up several values
         text: The text to search for
         exact_match: Whether to require an exact match
         
     Returns:
         A list of matching elements
     """
-    results = []
-    _search_elements(ui_data, text, exact_match, results, "text")
-    return results
+    return _find(ui_data, "text", text, exact_match)
 
-def find_elements_by_resource_id(ui_data: Dict[str, Any], resource_id: str) -> List[Dict[str, Any]]:
+def find_elements_by_resource_id(ui_data: Union[Dict[str, Any], "ElementIndex"], resource_id: str) -> List[Dict[str, Any]]:
     """
     Find UI elements by their resource ID.
     
     Args:
-        ui_data: The parsed UI hierarchy
+        ui_data: The parsed UI hierarchy, or an ElementIndex built from it
+                 (ElementIndex.from_ui_data) when looking up several values
         resource_id: The resource ID to search for
         
     Returns:
         A list of matching elements
     """
-    results = []
-    _search_elements(ui_data, resource_id, True, results, "resource-id")
-    return results
+    return _find(ui_data, "resource-id", resource_id, True)
 
-def _search_elements(node: Dict[str, Any], value: str, exact_match: bool, results: List[Dict[str, Any]], attr_name: str) -> None:
+def find_elements_by_content_desc(ui_data: Union[Dict[str, Any], "ElementIndex"], content_desc: str, exact_match: bool = False) -> List[Dict[str, Any]]:
     """
-    Recursively search for elements with matching attribute values.
+    Find UI elements by their content description.
     
     Args:
-        node: Current node to search
-        value: Value to match
+        ui_data: The parsed UI hierarchy, or an ElementIndex built from it
+                 (ElementIndex.from_ui_data) when looking up several values
+        content_desc: The description to search for
         exact_match: Whether to require an exact match
-        results: List to collect matching elements
-        attr_name: Name of the attribute to match against
-    """
-    # Check if this node matches
-    if attr_name in node:
-        node_value = node[attr_name]
-        if (exact_match and node_value == value) or (not exact_match and value.lower() in node_value.lower()):
-            results.append(node)
-    
-    # Search children
-    for child in node.get("children", []):
-        _search_elements(child, value, exact_match, results, attr_name) 
\ No newline at end of file
+        
+    Returns:
+        A list of matching elements
+    """
+    return _find(ui_data, "content-desc", content_desc, exact_match)
+
+def find_elements_by_class(ui_data: Union[Dict[str, Any], "ElementIndex"], class_name: str) -> List[Dict[str, Any]]:
+    """
+    Find UI elements by their class name.
+    
+    Args:
+        ui_data: The parsed UI hierarchy, or an ElementIndex built from it
+                 (ElementIndex.from_ui_data) when looking up several values
+        class_name: The class to search for, e.g. android.widget.Button
+        
+    Returns:
+        A list of matching elements
+    """
+    return _find(ui_data, "class", class_name, True)
+
+def _find(ui_data: Union[Dict[str, Any], "ElementIndex"], attr: str, value: str, exact_match: bool) -> List[Dict[str, Any]]:
+    """Query an index, or scan a hierarchy once (building an index costs more than one scan)."""
+    if isinstance(ui_data, ElementIndex):
+        return ui_data.find(attr, value, exact_match)
+    query = value.lower()
+    return [
+        node for node in flatten_ui_data(ui_data)
+        if attr in node and (node[attr] == value if exact_match else query in node[attr].lower())
+    ]
+
+class ElementIndex:
+    """
+    Lookup tables over one UI dump, built once and reused for every query.
+    
+    The caller owns the index and its lifetime: keep it next to the dump it
+    was built from (as UITree.element_index does) and rebuild it if the
+    dump is modified.
+    
+    Each indexed attribute gets an exact value -> elements map. Text-like
+    attributes additionally get lower-cased trigram postings, so substring
+    lookups only verify a few candidate values instead of walking the tree.
+    Results come back in document order, as a recursive walk would return them.
+    """
+    
+    GRAM = 3
+    INDEXED_ATTRS = ("text", "content-desc", "resource-id", "class")
+    SUBSTRING_ATTRS = ("text", "content-desc")
+    
+    def __init__(self, nodes: Sequence[Any], values: Dict[str, Sequence[Optional[str]]]):
+        """
+        Build the index.
+        
+        Args:
+            nodes: The element returned for each position
+            values: Attribute name -> value per position (None if absent)
+        """
+        self.nodes = nodes
+        self._exact: Dict[str, Dict[str, List[int]]] = {}
+        self._folded: Dict[str, List[Tuple[str, List[int]]]] = {}
+        self._grams: Dict[str, Dict[str, List[int]]] = {}
+        
+        for attr, column in values.items():
+            exact: Dict[str, List[int]] = {}
+            for i, value in enumerate(column):
+                if value is not None:
+                    exact.setdefault(value, []).append(i)
+            self._exact[attr] = exact
+            
+            if attr in self.SUBSTRING_ATTRS:
+                # Work on distinct values: far fewer than nodes on list screens
+                folded: Dict[str, List[int]] = {}
+                for value, positions in exact.items():
+                    folded.setdefault(value.lower(), []).extend(positions)
+                entries = list(folded.items())
+                grams: Dict[str, List[int]] = {}
+                for entry_id, (value, _) in enumerate(entries):
+                    for gram in {value[j:j + self.GRAM] for j in range(len(value) - self.GRAM + 1)}:
+                        grams.setdefault(gram, []).append(entry_id)
+                self._folded[attr] = entries
+                self._grams[attr] = grams
+    
+    @classmethod
+    def from_ui_data(cls, ui_data: Dict[str, Any]) -> "ElementIndex":
+        """Build an index over a parsed UI hierarchy."""
+        nodes = flatten_ui_data(ui_data)
+        values = {attr: [node.get(attr) for node in nodes] for attr in cls.INDEXED_ATTRS}
+        return cls(nodes, values)
+    
+    def find(self, attr: str, value: str, exact_match: bool = True) -> List[Any]:
+        """
+        Find elements by attribute value.
+        
+        Args:
+            attr: Attribute name, e.g. "text" or "resource-id"
+            value: Value to match
+            exact_match: Exact match, or case-insensitive substring match
+                         (substring matching needs a text-like attribute)
+            
+        Returns:
+            Matching elements in document order
+        """
+        if exact_match:
+            return [self.nodes[i] for i in self._exact.get(attr, {}).get(value, [])]
+        return [self.nodes[i] for i in self._find_substring(attr, value.lower())]
+    
+    def _find_substring(self, attr: str, query: str) -> List[int]:
+        if attr not in self._folded:
+            if attr not in self._exact:
+                return []
+            # Not n-gram indexed: scan distinct values instead of nodes
+            positions = [
+                i for value, indices in self._exact[attr].items()
+                if query in value.lower() for i in indices
+            ]
+            return sorted(positions)
+        
+        entries = self._folded[attr]
+        if len(query) < self.GRAM:
+            candidates = range(len(entries))
+        else:
+            grams = self._grams[attr]
+            postings = []
+            for gram in {query[j:j + self.GRAM] for j in range(len(query) - self.GRAM + 1)}:
+                if gram not in grams:
+                    return []
+                postings.append(grams[gram])
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates.intersection_update(posting)
+        
+        positions = []
+        for entry_id in candidates:
+            value, indices = entries[entry_id]
+            if query in value:
+                positions.extend(indices)
+        positions.sort()
+        return positions
+
+def flatten_ui_data(ui_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Flatten a parsed UI hierarchy into a list of nodes in document order.
+    
+    Args:
+        ui_data: The parsed UI hierarchy
+        
+    Returns:
+        Every node of the hierarchy, parents before their children
+    """
+    nodes = []
+    stack = [ui_data]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(reversed(node.get("children", [])))
+    return nodes
+
+class SpatialIndex:
+    """
+    Uniform grid over element bounds for fast coordinate hit-testing.
+    
+    Elements are referenced by their position in document order, which is
+    also Android's drawing order: for overlapping elements the later one is
+    on top. Build one per dump with build_spatial_index (dict hierarchy) or
+    UITree.spatial_index.
+    """
+    
+    def __init__(self,
+                 bounds: Sequence[Optional[Tuple[int, int, int, int]]],
+                 nodes: Sequence[Any],
+                 clickable: Optional[Sequence[bool]] = None,
+                 cell_size: int = 128):
+        """
+        Build the index.
+        
+        Args:
+            bounds: (left, top, right, bottom) per element, or None if it has no bounds
+            nodes: The element returned for each position
+            clickable: Whether each element is clickable
+            cell_size: Grid cell size in pixels
+        """
+        self.bounds = bounds
+        self.nodes = nodes
+        self.cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], List[int]] = {}
+        self._clickable_cells: Dict[Tuple[int, int], List[int]] = {}
+        
+        for i, rect in enumerate(bounds):
+            if rect is None or rect[2] <= rect[0] or rect[3] <= rect[1]:
+                continue
+            is_clickable = bool(clickable[i]) if clickable is not None else False
+            for cell in self._cells_for(rect):
+                self._cells.setdefault(cell, []).append(i)
+                if is_clickable:
+                    self._clickable_cells.setdefault(cell, []).append(i)
+        
+        # Corners of the occupied clickable grid, to bound ring searches
+        if self._clickable_cells:
+            xs = [cell[0] for cell in self._clickable_cells]
+            ys = [cell[1] for cell in self._clickable_cells]
+            self._clickable_extent = [(min(xs), min(ys)), (min(xs), max(ys)), (max(xs), min(ys)), (max(xs), max(ys))]
+    
+    def _cells_for(self, rect: Tuple[int, int, int, int]) -> Iterator[Tuple[int, int]]:
+        size = self.cell_size
+        for cx in range(rect[0] // size, (rect[2] - 1) // size + 1):
+            for cy in range(rect[1] // size, (rect[3] - 1) // size + 1):
+                yield cx, cy
+    
+    def topmost_at(self, x: int, y: int) -> Optional[Any]:
+        """
+        Find the topmost element containing a point.
+        
+        Args:
+            x: Horizontal coordinate in pixels
+            y: Vertical coordinate in pixels
+            
+        Returns:
+            The element drawn on top at (x, y), or None
+        """
+        candidates = self._cells.get((x // self.cell_size, y // self.cell_size), [])
+        # Cell lists are in document order, so scan from the end
+        for i in reversed(candidates):
+            rect = self.bounds[i]
+            if rect[0] <= x < rect[2] and rect[1] <= y < rect[3]:
+                return self.nodes[i]
+        return None
+    
+    def elements_at(self, x: int, y: int) -> List[Any]:
+        """All elements containing a point, topmost first."""
+        candidates = self._cells.get((x // self.cell_size, y // self.cell_size), [])
+        return [
+            self.nodes[i] for i in reversed(candidates)
+            if self.bounds[i][0] <= x < self.bounds[i][2] and self.bounds[i][1] <= y < self.bounds[i][3]
+        ]
+    
+    def intersecting(self, left: int, top: int, right: int, bottom: int) -> List[Any]:
+        """
+        Find elements that intersect a rectangle.
+        
+        Returns:
+            Matching elements in document order
+        """
+        if right <= left or bottom <= top:
+            return []
+        found = set()
+        for cell in self._cells_for((left, top, right, bottom)):
+            for i in self._cells.get(cell, []):
+                rect = self.bounds[i]
+                if rect[0] < right and left < rect[2] and rect[1] < bottom and top < rect[3]:
+                    found.add(i)
+        return [self.nodes[i] for i in sorted(found)]
+    
+    def nearest_clickable(self, x: int, y: int, max_distance: Optional[int] = None) -> Optional[Any]:
+        """
+        Find the clickable element closest to a point.
+        
+        An element containing the point has distance 0; among those the
+        topmost wins. Useful for snapping imprecise coordinates to a target.
+        
+        Args:
+            x: Horizontal coordinate in pixels
+            y: Vertical coordinate in pixels
+            max_distance: Ignore elements farther away than this many pixels
+            
+        Returns:
+            The nearest clickable element, or None
+        """
+        if not self._clickable_cells:
+            return None
+        size = self.cell_size
+        cx, cy = x // size, y // size
+        best = None
+        best_distance = None
+        max_ring = max(
+            max(abs(cell[0] - cx), abs(cell[1] - cy)) for cell in self._clickable_extent
+        )
+        
+        for ring in range(max_ring + 1):
+            # Every element in a farther ring is at least this far away
+            ring_distance = max(0, (ring - 1) * size)
+            if best_distance is not None and ring_distance > best_distance:
+                break
+            if max_distance is not None and ring_distance > max_distance:
+                break
+            for cell in _ring_cells(cx, cy, ring):
+                for i in self._clickable_cells.get(cell, []):
+                    distance = _distance_to_rect(x, y, self.bounds[i])
+                    if best_distance is None or distance < best_distance or (distance == best_distance and i > best):
+                        best, best_distance = i, distance
+        
+        if best is None or (max_distance is not None and best_distance > max_distance):
+            return None
+        return self.nodes[best]
+
+def build_spatial_index(ui_data: Dict[str, Any], cell_size: int = 128) -> SpatialIndex:
+    """
+    Build a spatial index over a parsed UI hierarchy.
+    
+    Args:
+        ui_data: The parsed UI hierarchy
+        cell_size: Grid cell size in pixels
+        
+    Returns:
+        A SpatialIndex whose queries return the hierarchy's node dictionaries
+    """
+    nodes = flatten_ui_data(ui_data)
+    bounds = [_bounds_tuple(node.get("bounds")) for node in nodes]
+    clickable = [node.get("clickable") == "true" for node in nodes]
+    return SpatialIndex(bounds, nodes, clickable, cell_size)
+
+def _bounds_tuple(bounds: Optional[Dict[str, int]]) -> Optional[Tuple[int, int, int, int]]:
+    if not bounds:
+        return None
+    return bounds["left"], bounds["top"], bounds["right"], bounds["bottom"]
+
+def _ring_cells(cx: int, cy: int, ring: int) -> Iterator[Tuple[int, int]]:
+    if ring == 0:
+        yield cx, cy
+        return
+    for dx in range(-ring, ring + 1):
+        yield cx + dx, cy - ring
+        yield cx + dx, cy + ring
+    for dy in range(-ring + 1, ring):
+        yield cx - ring, cy + dy
+        yield cx + ring, cy + dy
+
+def _distance_to_rect(x: int, y: int, rect: Tuple[int, int, int, int]) -> float:
+    dx = max(rect[0] - x, 0, x - (rect[2] - 1))
+    dy = max(rect[1] - y, 0, y - (rect[3] - 1))
+    return (dx * dx + dy * dy) ** 0.5
@@ -0,0 +1,340 @@
+"""
+Compact, array-backed representation of a UI hierarchy
+"""
+
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from .ui_dump_parser import ElementIndex, SpatialIndex, bounds_to_dict, iter_ui_nodes
+
+# Interned string attributes, stored as indices into UITree.strings
+STRING_ATTRS = ("text", "resource-id", "class", "package", "content-desc")
+
+# Boolean attributes, stored as one bit each in UITree.flags
+FLAG_ATTRS = (
+    "checkable", "checked", "clickable", "enabled", "focusable",
+    "focused", "scrollable", "long-clickable", "password", "selected",
+)
+FLAG_BITS = {name: 1 << bit for bit, name in enumerate(FLAG_ATTRS)}
+
+# Presence bits, so to_dict() reproduces exactly the attributes in the dump
+_PRESENT_INDEX = 1 << 0
+_PRESENT_BOUNDS = 1 << 1
+_PRESENT_STRING = {name: 1 << (2 + i) for i, name in enumerate(STRING_ATTRS)}
+_PRESENT_FLAG = {name: 1 << (2 + len(STRING_ATTRS) + i) for i, name in enumerate(FLAG_ATTRS)}
+
+
+class UITree:
+    """
+    A UI hierarchy stored as parallel arrays, one slot per node.
+
+    Nodes are numbered in document order (the root is 0). Per node the tree
+    keeps the parent index, bounds, interned string ids and flag bitsets;
+    rarely used attributes go to a sparse ``extra`` map. Use ``node(i)`` for
+    a lightweight view and ``to_dict()`` for the parse_ui_dump form.
+    """
+
+    def __init__(self):
+        self.strings: List[str] = [""]
+        self._string_ids: Dict[str, int] = {"": 0}
+        self.parent = array("i")
+        self.index = array("i")
+        self.flags = array("H")
+        self.present = array("I")
+        self.columns: Dict[str, array] = {name: array("i") for name in STRING_ATTRS}
+        self.extra: Dict[int, Dict[str, str]] = {}
+        self._bounds = array("i")
+        self._bounds_view = None
+        self._children: Optional[List[List[int]]] = None
+        self._spatial_index: Optional[SpatialIndex] = None
+        self._element_index: Optional[ElementIndex] = None
+
+    @classmethod
+    def from_xml(cls, xml_data: Union[str, bytes]) -> "UITree":
+        """
+        Build a tree from uiautomator XML in a single streaming pass.
+
+        Args:
+            xml_data: The XML string (or bytes) from uiautomator dump
+
+        Returns:
+            The parsed UITree
+        """
+        tree = cls()
+        try:
+            for parent, attrib, bounds in iter_ui_nodes(xml_data):
+                tree._append(parent, attrib, bounds)
+        except Exception as e:
+            raise ValueError(f"Failed to parse UI dump: {str(e)}")
+        if not len(tree):
+            raise ValueError("Failed to parse UI dump: empty document")
+        return tree
+
+    def _intern(self, value: str) -> int:
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = len(self.strings)
+            self._string_ids[value] = string_id
+            self.strings.append(value)
+        return string_id
+
+    def _append(self, parent: int, attrib: Dict[str, str], bounds: Optional[Tuple[int, int, int, int]]) -> None:
+        present = 0
+        flags = 0
+        extra = None
+
+        index = attrib.pop("index", None)
+        if index is not None and index.lstrip("-").isdigit():
+            present |= _PRESENT_INDEX
+            self.index.append(int(index))
+        else:
+            self.index.append(-1)
+            if index is not None:
+                extra = {"index": index}
+
+        for name in STRING_ATTRS:
+            value = attrib.pop(name, None)
+            if value is None:
+                self.columns[name].append(0)
+            else:
+                present |= _PRESENT_STRING[name]
+                self.columns[name].append(self._intern(value))
+
+        for name in FLAG_ATTRS:
+            value = attrib.pop(name, None)
+            if value == "true":
+                flags |= FLAG_BITS[name]
+                present |= _PRESENT_FLAG[name]
+            elif value == "false":
+                present |= _PRESENT_FLAG[name]
+            elif value is not None:
+                extra = extra or {}
+                extra[name] = value
+
+        if bounds is not None:
+            present |= _PRESENT_BOUNDS
+            self._bounds.extend(bounds)
+        else:
+            self._bounds.extend((0, 0, 0, 0))
+
+        if attrib:
+            extra = extra or {}
+            extra.update(attrib)
+        if extra:
+            self.extra[len(self.parent)] = extra
+
+        self.parent.append(parent)
+        self.flags.append(flags)
+        self.present.append(present)
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def __iter__(self) -> Iterator["UINode"]:
+        for i in range(len(self)):
+            yield UINode(self, i)
+
+    @property
+    def root(self) -> "UINode":
+        return UINode(self, 0)
+
+    def node(self, i: int) -> "UINode":
+        """Return a view of the node at index i."""
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return UINode(self, i)
+
+    @property
+    def bounds(self) -> Any:
+        """All node bounds as an (N, 4) int32 NumPy array sharing the tree's memory."""
+        if self._bounds_view is None:
+            import numpy as np
+
+            self._bounds_view = np.frombuffer(self._bounds, dtype=np.int32).reshape(-1, 4)
+        return self._bounds_view
+
+    def bounds_of(self, i: int) -> Optional[Tuple[int, int, int, int]]:
+        """Bounds of node i as (left, top, right, bottom), or None if absent."""
+        if not self.present[i] & _PRESENT_BOUNDS:
+            return None
+        offset = i * 4
+        return tuple(self._bounds[offset:offset + 4])
+
+    @property
+    def spatial_index(self) -> SpatialIndex:
+        """Grid index over node bounds, built on first use; queries return UINodes."""
+        if self._spatial_index is None:
+            bit = FLAG_BITS["clickable"]
+            self._spatial_index = SpatialIndex(
+                [self.bounds_of(i) for i in range(len(self))],
+                _NodeSequence(self),
+                [bool(flags & bit) for flags in self.flags]
+            )
+        return self._spatial_index
+
+    @property
+    def element_index(self) -> ElementIndex:
+        """Text / resource-id / class lookup tables, built on first use; queries return UINodes."""
+        if self._element_index is None:
+            values = {}
+            for attr in ElementIndex.INDEXED_ATTRS:
+                column = self.columns[attr]
+                bit = _PRESENT_STRING[attr]
+                values[attr] = [
+                    self.strings[column[i]] if self.present[i] & bit else None
+                    for i in range(len(self))
+                ]
+            self._element_index = ElementIndex(_NodeSequence(self), values)
+        return self._element_index
+
+    def string(self, attr: str, i: int) -> str:
+        """Value of an interned string attribute for node i."""
+        return self.strings[self.columns[attr][i]]
+
+    def children_of(self, i: int) -> List[int]:
+        """Indices of the direct children of node i, in document order."""
+        if self._children is None:
+            children: List[List[int]] = [[] for _ in range(len(self))]
+            for child, parent in enumerate(self.parent):
+                if parent >= 0:
+                    children[parent].append(child)
+            self._children = children
+        return self._children[i]
+
+    def find(self, attr: str, value: str) -> List["UINode"]:
+        """Nodes whose string attribute equals value, found by comparing interned ids."""
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            return []
+        column = self.columns[attr]
+        return [UINode(self, i) for i in range(len(column)) if column[i] == string_id]
+
+    def with_flag(self, flag: str) -> List["UINode"]:
+        """Nodes with the given boolean attribute set (e.g. "clickable")."""
+        bit = FLAG_BITS[flag]
+        flags = self.flags
+        return [UINode(self, i) for i in range(len(flags)) if flags[i] & bit]
+
+    def node_dict(self, i: int) -> Dict[str, Any]:
+        """Attributes of node i in parse_ui_dump form, without children."""
+        present = self.present[i]
+        result: Dict[str, Any] = {}
+        if present & _PRESENT_INDEX:
+            result["index"] = str(self.index[i])
+        for name in STRING_ATTRS:
+            if present & _PRESENT_STRING[name]:
+                result[name] = self.strings[self.columns[name][i]]
+        flags = self.flags[i]
+        for name in FLAG_ATTRS:
+            if present & _PRESENT_FLAG[name]:
+                result[name] = "true" if flags & FLAG_BITS[name] else "false"
+        if i in self.extra:
+            result.update(self.extra[i])
+        if present & _PRESENT_BOUNDS:
+            result["bounds"] = bounds_to_dict(self.bounds_of(i))
+        return result
+
+    def to_dict(self, i: int = 0) -> Dict[str, Any]:
+        """Materialize the subtree at node i in the parse_ui_dump dict form."""
+        nodes = {i: self.node_dict(i)}
+        # A subtree is contiguous in document order
+        for n in range(i + 1, len(self)):
+            parent = self.parent[n]
+            if parent not in nodes:
+                break
+            nodes[n] = self.node_dict(n)
+            nodes[parent].setdefault("children", []).append(nodes[n])
+        return nodes[i]
+
+
+class _NodeSequence:
+    """Index-to-UINode adapter that creates views only when accessed."""
+
+    __slots__ = ("tree",)
+
+    def __init__(self, tree: UITree):
+        self.tree = tree
+
+    def __len__(self) -> int:
+        return len(self.tree)
+
+    def __getitem__(self, i: int) -> "UINode":
+        return UINode(self.tree, i)
+
+
+class UINode:
+    """Lightweight view of one node in a UITree."""
+
+    __slots__ = ("tree", "index")
+
+    def __init__(self, tree: UITree, index: int):
+        self.tree = tree
+        self.index = index
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, UINode) and other.tree is self.tree and other.index == self.index
+
+    def __hash__(self) -> int:
+        return hash((id(self.tree), self.index))
+
+    def __repr__(self) -> str:
+        return f"UINode({self.index}, class={self.class_name!r}, text={self.text!r}, bounds={self.bounds})"
+
+    @property
+    def text(self) -> str:
+        return self.tree.string("text", self.index)
+
+    @property
+    def resource_id(self) -> str:
+        return self.tree.string("resource-id", self.index)
+
+    @property
+    def class_name(self) -> str:
+        return self.tree.string("class", self.index)
+
+    @property
+    def package(self) -> str:
+        return self.tree.string("package", self.index)
+
+    @property
+    def content_desc(self) -> str:
+        return self.tree.string("content-desc", self.index)
+
+    @property
+    def bounds(self) -> Optional[Tuple[int, int, int, int]]:
+        return self.tree.bounds_of(self.index)
+
+    @property
+    def center(self) -> Optional[Tuple[int, int]]:
+        bounds = self.bounds
+        if bounds is None:
+            return None
+        return (bounds[0] + bounds[2]) // 2, (bounds[1] + bounds[3]) // 2
+
+    @property
+    def parent(self) -> Optional["UINode"]:
+        parent = self.tree.parent[self.index]
+        return UINode(self.tree, parent) if parent >= 0 else None
+
+    @property
+    def children(self) -> List["UINode"]:
+        return [UINode(self.tree, i) for i in self.tree.children_of(self.index)]
+
+    def has_flag(self, flag: str) -> bool:
+        return bool(self.tree.flags[self.index] & FLAG_BITS[flag])
+
+    @property
+    def clickable(self) -> bool:
+        return self.has_flag("clickable")
+
+    @property
+    def enabled(self) -> bool:
+        return self.has_flag("enabled")
+
+    @property
+    def scrollable(self) -> bool:
+        return self.has_flag("scrollable")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """This node's subtree in parse_ui_dump dict form."""
+        return self.tree.to_dict(self.index)
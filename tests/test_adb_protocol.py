@@ -0,0 +1,108 @@
+import asyncio
+import struct
+
+from manus_mobile.adb_protocol import ADBServerClient
+
+
+class FakeADBServer:
+    """Minimal adb server speaking the host protocol over a local socket."""
+
+    def __init__(self, features="shell_v2,cmd", failing_features=0):
+        self.features = features
+        self.failing_features = failing_features
+        self.requests = []
+        self.server = None
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _read_request(self, reader):
+        length = int(await reader.readexactly(4), 16)
+        request = (await reader.readexactly(length)).decode("utf-8")
+        self.requests.append(request)
+        return request
+
+    @staticmethod
+    def _message(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return b"%04x" % len(data) + data
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await self._read_request(reader)
+            if request.endswith("features"):
+                if self.failing_features:
+                    self.failing_features -= 1
+                    writer.write(b"FAIL" + self._message("device still connecting"))
+                else:
+                    writer.write(b"OKAY" + self._message(self.features))
+            elif request.startswith("host:transport"):
+                writer.write(b"OKAY")
+                service = await self._read_request(reader)
+                writer.write(b"OKAY")
+                command = service.split(":", 1)[1]
+                if service.startswith("shell,v2"):
+                    for packet_id, data in ((1, f"out:{command}".encode()), (2, b"err"), (3, b"\x02")):
+                        writer.write(struct.pack("<BI", packet_id, len(data)) + data)
+                else:
+                    writer.write(f"out:{command}err".encode())
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+def _run(server, scenario):
+    async def main():
+        port = await server.start()
+        try:
+            return await scenario(ADBServerClient(port=port))
+        finally:
+            await server.stop()
+    return asyncio.run(main())
+
+
+def test_shell_v2_separates_streams_and_exit_code():
+    server = FakeADBServer()
+    result = _run(server, lambda client: client.shell("emulator-5554", "ls"))
+    assert result == {"stdout": "out:ls", "stderr": "err", "exit_code": 2}
+    assert "shell,v2,raw:ls" in server.requests
+
+
+def test_shell_without_v2_merges_streams():
+    server = FakeADBServer(features="cmd")
+    result = _run(server, lambda client: client.shell("emulator-5554", "ls"))
+    assert result == {"stdout": "out:lserr", "stderr": "", "exit_code": None}
+
+
+def test_failed_features_query_is_not_cached():
+    async def scenario(client):
+        first = await client.features("emulator-5554")
+        second = await client.features("emulator-5554")
+        third = await client.features("emulator-5554")
+        return first, second, third
+
+    server = FakeADBServer(failing_features=1)
+    first, second, third = _run(server, scenario)
+    assert first == []
+    assert second == third == ["shell_v2", "cmd"]
+    assert server.requests.count("host-serial:emulator-5554:features") == 2
+
+
+def test_client_created_outside_the_event_loop():
+    client = ADBServerClient(max_connections=1)
+    server = FakeADBServer()
+
+    async def main():
+        client.port = await server.start()
+        try:
+            return await asyncio.gather(*(client.shell("emulator-5554", f"echo {i}") for i in range(3)))
+        finally:
+            await server.stop()
+
+    results = asyncio.run(main())
+    assert [result["stdout"] for result in results] == [f"out:echo {i}" for i in range(3)]
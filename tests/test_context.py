@@ -0,0 +1,77 @@
+import json
+
+from manus_mobile.context import ContextManager
+
+
+def _history(steps):
+    history = [
+        {"role": "system", "content": "sys"},
+        {"role": "user", "content": "order coffee"}
+    ]
+    for i in range(steps):
+        history.append({"role": "assistant", "content": "", "tool_calls": [{
+            "id": f"c{i}", "type": "function",
+            "function": {"name": "mobile_computer", "arguments": json.dumps({"action": "tap", "coordinate": [i, i]})}
+        }]})
+        history.append({"role": "tool", "tool_call_id": f"c{i}", "content": "Screenshot captured; the image follows."})
+        history.append({"role": "user", "content": [
+            {"type": "text", "text": "Screenshot of the current screen:"},
+            {"type": "image_url", "image_url": {"url": "data:image/png;base64,AAAA"}}
+        ]})
+    return history
+
+
+def test_dropped_steps_keep_roles_and_tool_calls_paired():
+    manager = ContextManager(max_tokens=1200)
+    messages = manager.build(_history(6))
+
+    dropped = manager.last_stats["dropped_steps"]
+    assert dropped > 0
+    assert messages[2]["role"] == "user"
+    assert f"{dropped} earlier steps omitted" in messages[2]["content"]
+    assert messages[3]["role"] == "assistant"
+
+    roles = [message["role"] for message in messages]
+    assert ("assistant", "assistant") not in zip(roles, roles[1:])
+    calls = set()
+    for message in messages:
+        calls.update(call["id"] for call in message.get("tool_calls") or [])
+        if message["role"] == "tool":
+            assert message["tool_call_id"] in calls
+
+
+def test_history_within_budget_is_not_dropped():
+    manager = ContextManager(max_tokens=100000)
+    manager.build(_history(3))
+    assert manager.last_stats["dropped_steps"] == 0
+
+
+def _call(i, **arguments):
+    return {"role": "assistant", "content": "", "tool_calls": [{
+        "id": f"c{i}", "type": "function",
+        "function": {"name": "mobile_computer", "arguments": json.dumps(arguments)}
+    }]}
+
+
+def test_full_hierarchy_is_kept_with_the_diffs_after_it():
+    old_screen = json.dumps({"class": "FrameLayout", "package": "com.old", "bounds": [0, 0, 1080, 2400], "children": []})
+    screen = json.dumps({"class": "FrameLayout", "package": "com.example", "bounds": [0, 0, 1080, 2400], "children": [
+        {"class": "Button", "text": "Order", "bounds": [100, 300, 500, 400]}
+    ]})
+    diff = json.dumps({"type": "ui_diff", "changed": [{"key": "FrameLayout/Button", "attrs": {"text": "Ordered"}}], "added": [], "removed": [], "unchanged": 1})
+    history = [
+        {"role": "system", "content": "sys"},
+        {"role": "user", "content": "order coffee"},
+        _call(0, action="dump_ui"),
+        {"role": "tool", "tool_call_id": "c0", "content": old_screen},
+        _call(1, action="dump_ui"),
+        {"role": "tool", "tool_call_id": "c1", "content": screen},
+        _call(2, action="tap", coordinate=[300, 350]),
+        {"role": "tool", "tool_call_id": "c2", "content": diff}
+    ]
+
+    messages = ContextManager().build(history)
+
+    assert messages[3]["content"].startswith("[Earlier screen of com.old")
+    assert messages[5]["content"] == screen
+    assert messages[7]["content"] == diff
@@ -0,0 +1,97 @@
+import re
+import struct
+import subprocess
+
+import pytest
+
+from manus_mobile.gestures import (
+    ABS_MT_POSITION_X, ABS_MT_POSITION_Y, ABS_MT_SLOT, ABS_MT_TRACKING_ID,
+    BTN_TOUCH, EV_ABS, EV_KEY, EV_SYN, SYN_REPORT, TouchDevice,
+    compile_frames, pack_event, tap_frames, to_natural
+)
+
+SCREEN = (1080, 2400)
+DEVICE = TouchDevice("/dev/input/event2", 1079, 2399, 10, has_pressure=False, has_touch_major=False)
+
+
+def _decode(script, time_size):
+    """The (type, code, value) events of each printf in a compiled script."""
+    frames = []
+    for escaped in re.findall(r"printf '((?:\\[0-7]{3})*)'", script):
+        data = bytes(int(octal, 8) for octal in escaped.split("\\")[1:])
+        size = time_size + 8
+        assert len(data) % size == 0
+        events = []
+        for offset in range(0, len(data), size):
+            assert data[offset:offset + time_size] == bytes(time_size)
+            events.append(struct.unpack("<HHi", data[offset + time_size:offset + size]))
+        frames.append(events)
+    return frames
+
+
+@pytest.mark.parametrize("time_size", [16, 8])
+def test_pack_event_layout(time_size):
+    data = pack_event(EV_ABS, ABS_MT_TRACKING_ID, -1, time_size)
+    assert len(data) == time_size + 8
+    assert data[:time_size] == bytes(time_size)
+    assert data[time_size:] == b"\x03\x00\x39\x00\xff\xff\xff\xff"
+
+
+@pytest.mark.parametrize("rotation, point, natural", [
+    (0, (100, 200), (100, 200)),
+    (1, (100, 200), (879, 100)),
+    (2, (100, 200), (979, 2199)),
+    (3, (100, 200), (200, 2299)),
+])
+def test_to_natural(rotation, point, natural):
+    assert to_natural(point, SCREEN, rotation) == natural
+
+
+@pytest.mark.parametrize("rotation", [0, 1, 2, 3])
+def test_to_natural_maps_display_corners_onto_panel_corners(rotation):
+    width, height = SCREEN if rotation % 2 == 0 else SCREEN[::-1]
+    corners = {(0, 0), (width - 1, 0), (0, height - 1), (width - 1, height - 1)}
+    panel = {(0, 0), (SCREEN[0] - 1, 0), (0, SCREEN[1] - 1), (SCREEN[0] - 1, SCREEN[1] - 1)}
+    assert {to_natural(corner, SCREEN, rotation) for corner in corners} == panel
+
+
+@pytest.mark.parametrize("time_size", [16, 8])
+def test_compile_tap(time_size):
+    script = compile_frames(tap_frames((100, 200), hold=40), DEVICE, SCREEN, rotation=1, time_size=time_size)
+
+    assert script.startswith("(printf '")
+    assert " && sleep 0.04 && " in script
+    assert script.endswith(") > /dev/input/event2")
+    down, up = _decode(script, time_size)
+    assert down == [
+        (EV_ABS, ABS_MT_SLOT, 0),
+        (EV_ABS, ABS_MT_TRACKING_ID, 1),
+        (EV_ABS, ABS_MT_POSITION_X, 879),
+        (EV_ABS, ABS_MT_POSITION_Y, 100),
+        (EV_KEY, BTN_TOUCH, 1),
+        (EV_SYN, SYN_REPORT, 0),
+    ]
+    assert up == [
+        (EV_ABS, ABS_MT_SLOT, 0),
+        (EV_ABS, ABS_MT_TRACKING_ID, -1),
+        (EV_KEY, BTN_TOUCH, 0),
+        (EV_SYN, SYN_REPORT, 0),
+    ]
+
+
+def test_compile_scales_to_device_units():
+    device = TouchDevice("/dev/input/event2", 4095, 4095, 10, has_pressure=False, has_touch_major=False)
+    script = compile_frames(tap_frames((1079, 2399)), device, SCREEN)
+    down = _decode(script, 16)[0]
+    assert (EV_ABS, ABS_MT_POSITION_X, 4095) in down
+    assert (EV_ABS, ABS_MT_POSITION_Y, 4095) in down
+
+
+def test_shell_writes_the_packed_events(tmp_path):
+    target = tmp_path / "event"
+    device = TouchDevice(str(target), 1079, 2399, 10, has_pressure=False, has_touch_major=False)
+    script = compile_frames(tap_frames((100, 200), hold=0), device, SCREEN)
+    subprocess.run(["sh", "-c", script], check=True)
+    expected = b"".join(pack_event(*event) for frame in _decode(script, 16) for event in frame)
+    assert target.read_bytes() == expected
+    assert len(expected) == 10 * 24
@@ -0,0 +1,66 @@
+import asyncio
+import json
+
+from manus_mobile.llm_cache import DecisionCache, ui_fingerprint
+
+
+def _screen(top, text="Order 12:30"):
+    return {
+        "class": "android.widget.FrameLayout",
+        "bounds": {"left": 0, "top": 0, "right": 1080, "bottom": 2400},
+        "children": [{
+            "class": "android.widget.Button",
+            "text": text,
+            "bounds": {"left": 100, "top": top, "right": 500, "bottom": top + 100}
+        }]
+    }
+
+
+def test_volatile_text_is_normalized():
+    assert ui_fingerprint(_screen(300)) == ui_fingerprint(_screen(300, text="Order 13:45"))
+
+
+def test_shifted_bounds_change_the_fingerprint():
+    assert ui_fingerprint(_screen(300)) != ui_fingerprint(_screen(420))
+
+
+def test_shifted_bounds_change_the_cache_key():
+    cache = DecisionCache()
+
+    def messages(screen):
+        return [
+            {"role": "system", "content": "sys"},
+            {"role": "user", "content": "order coffee"},
+            {"role": "tool", "tool_call_id": "c0", "content": json.dumps(screen)}
+        ]
+
+    assert cache.make_key(messages(_screen(300))) != cache.make_key(messages(_screen(420)))
+
+
+def test_requests_without_a_fresh_hierarchy_bypass_the_cache():
+    cache = DecisionCache()
+    calls = []
+
+    async def llm(messages, tools=None):
+        calls.append(messages)
+        return {"tool_calls": [{"id": "c1", "function": {"name": "mobile_computer", "arguments": '{"action": "tap", "coordinate": [1, 2]}'}}]}
+
+    dumped = [
+        {"role": "system", "content": "sys"},
+        {"role": "user", "content": "order coffee"},
+        {"role": "assistant", "content": "", "tool_calls": [{"id": "c0", "function": {"name": "mobile_computer", "arguments": '{"action": "dump_ui"}'}}]},
+        {"role": "tool", "tool_call_id": "c0", "content": json.dumps(_screen(300))}
+    ]
+    executed = dumped + [
+        {"role": "assistant", "content": "", "tool_calls": [{"id": "c1", "function": {"name": "mobile_computer", "arguments": '{"action": "tap", "coordinate": [1, 2]}'}}]},
+        {"role": "tool", "tool_call_id": "c1", "content": "Executed tap"}
+    ]
+
+    async def run():
+        for messages in (dumped[:2], dumped[:2], executed, executed, dumped, dumped):
+            await cache.call(llm, messages)
+
+    asyncio.run(run())
+    assert len(calls) == 5
+    assert cache.stats()["bypassed"] == 4
+    assert cache.stats()["hits"] == 1
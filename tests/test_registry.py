@@ -0,0 +1,47 @@
+import asyncio
+import stat
+
+from manus_mobile.registry import ClientRegistry
+
+
+def _fake_adb(tmp_path):
+    """An `adb` whose `shell` runs the command in a local sh."""
+    path = tmp_path / "adb"
+    path.write_text('#!/bin/sh\n[ "$1" = shell ] && shift && exec sh -c "$*"\necho "Android Debug Bridge"\n')
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+def _run(coroutine):
+    # Like asyncio.run, without cancelling leftovers: tasks stuck on another
+    # loop's futures would never finish cancelling
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_clients_are_not_reused_across_event_loops(tmp_path):
+    registry = ClientRegistry()
+    adb_path = _fake_adb(tmp_path)
+
+    async def task():
+        client = registry.client(adb_path=adb_path, max_concurrency=1)
+        results = await asyncio.gather(*(client.shell(f"echo {i}") for i in range(3)))
+        return [result["stdout"].strip() for result in results]
+
+    assert _run(task()) == ["0", "1", "2"]
+    assert _run(task()) == ["0", "1", "2"]
+    assert registry.stats()["loop_resets"] == 1
+
+
+def test_clients_are_reused_within_an_event_loop(tmp_path):
+    registry = ClientRegistry()
+    adb_path = _fake_adb(tmp_path)
+
+    async def task():
+        return registry.client(adb_path=adb_path) is registry.client(adb_path=adb_path)
+
+    assert asyncio.run(task())
+    assert registry.stats()["loop_resets"] == 0
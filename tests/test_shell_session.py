@@ -0,0 +1,53 @@
+import asyncio
+import stat
+
+from manus_mobile.shell_session import ShellSession
+
+
+def _fake_adb(tmp_path, merged):
+    """An `adb` that runs a local sh for `adb shell`, like adb with or without shell_v2."""
+    path = tmp_path / "adb"
+    path.write_text("#!/bin/sh\nexec sh%s\n" % (" 2>&1" if merged else ""))
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+def _run(adb_path, *commands):
+    async def main():
+        session = ShellSession(adb_path, timeout=5.0)
+        try:
+            return [await session.run(command) for command in commands], session.merged_stderr
+        finally:
+            await session.close()
+    return asyncio.run(main())
+
+
+def test_separate_streams(tmp_path):
+    results, merged = _run(_fake_adb(tmp_path, merged=False), "echo out; echo err >&2; exit_code() { return 3; }; exit_code")
+    assert not merged
+    assert results == [{"stdout": "out\n", "stderr": "err\n", "exit_code": 3}]
+
+
+def test_merged_stderr_does_not_hang(tmp_path):
+    results, merged = _run(_fake_adb(tmp_path, merged=True), "echo out; echo err >&2", "false")
+    assert merged
+    assert results[0] == {"stdout": "out\nerr\n", "stderr": "", "exit_code": 0}
+    assert results[1]["exit_code"] == 1
+
+
+def test_cancelled_command_does_not_leak_into_the_next(tmp_path):
+    async def main():
+        session = ShellSession(_fake_adb(tmp_path, merged=False), timeout=5.0)
+        try:
+            running = asyncio.ensure_future(session.run("sleep 0.2; echo stale"))
+            await asyncio.sleep(0.05)
+            running.cancel()
+            try:
+                await running
+            except asyncio.CancelledError:
+                pass
+            return await session.run("echo fresh")
+        finally:
+            await session.close()
+
+    assert asyncio.run(main())["stdout"] == "fresh\n"
@@ -0,0 +1,82 @@
+import copy
+
+from manus_mobile.ui_diff import diff_ui, is_small_diff, node_keys
+
+
+def _node(cls, resource_id="", text="", children=None):
+    node = {"class": f"android.widget.{cls}", "resource-id": resource_id, "text": text}
+    if children:
+        node["children"] = children
+    return node
+
+
+def _screen(*children):
+    return {"rotation": "0", "children": [_node("FrameLayout", children=list(children))]}
+
+
+def _rows(count):
+    return [_node("TextView", "com.example:id/title", f"row {i}") for i in range(count)]
+
+
+def test_sibling_keys_are_indexed_by_class_and_id():
+    ui = _screen(*_rows(3), _node("Button", text="Order"), _node("Button", text="Cancel"))
+
+    keys = [key for key, _, _ in node_keys(ui)]
+
+    assert keys == [
+        "",
+        "FrameLayout",
+        "FrameLayout/TextView#title",
+        "FrameLayout/TextView#title[1]",
+        "FrameLayout/TextView#title[2]",
+        "FrameLayout/Button",
+        "FrameLayout/Button[1]",
+    ]
+
+
+def test_change_is_reported_at_the_sibling_index():
+    old = _screen(*_rows(3))
+    new = copy.deepcopy(old)
+    new["children"][0]["children"][1]["text"] = "row one"
+
+    delta = diff_ui(old, new)
+
+    assert delta["changed"] == [{"key": "FrameLayout/TextView#title[1]", "attrs": {"text": "row one"}}]
+    assert delta["added"] == [] and delta["removed"] == []
+    assert delta["unchanged"] == 4
+
+
+def test_added_subtree_is_reported_once_at_its_root():
+    old = _screen(_node("Button", text="Order"))
+    new = _screen(_node("Button", text="Order"), _node("ListView", "com.example:id/list", children=_rows(3)))
+
+    delta = diff_ui(old, new)
+
+    assert [entry["key"] for entry in delta["added"]] == ["FrameLayout/ListView#list"]
+    assert delta["added"][0]["node"]["children"] == _rows(3)
+    assert delta["changed"] == [] and delta["removed"] == []
+    assert delta["unchanged"] == 3
+
+
+def test_removed_subtree_is_reported_by_its_root_key():
+    old = _screen(_node("Button", text="Order"), _node("ListView", "com.example:id/list", children=_rows(3)))
+    new = _screen(_node("Button", text="Order"))
+
+    delta = diff_ui(old, new)
+
+    assert delta["removed"] == ["FrameLayout/ListView#list"]
+    assert delta["changed"] == [] and delta["added"] == []
+    assert delta["unchanged"] == 3
+
+
+def test_is_small_diff():
+    old = _screen(*_rows(4))
+    one_change = copy.deepcopy(old)
+    one_change["children"][0]["children"][0]["text"] = "first"
+    replaced = _screen(_node("ListView", "com.example:id/list", children=_rows(4)))
+
+    assert is_small_diff(diff_ui(old, old))
+    assert is_small_diff(diff_ui(old, one_change))
+    # Four rows removed, one list added, only the root and frame matched
+    assert not is_small_diff(diff_ui(old, replaced))
+    assert is_small_diff(diff_ui(old, replaced), max_ratio=0.8)
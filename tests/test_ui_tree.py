@@ -0,0 +1,48 @@
+import numpy as np
+
+from manus_mobile.ui_dump_parser import parse_ui_dump
+from manus_mobile.ui_tree import UITree
+
+DUMP = """<?xml version='1.0' encoding='UTF-8' standalone='yes' ?>
+<hierarchy rotation="1">
+  <node index="0" text="" resource-id="" class="android.widget.FrameLayout" package="com.example" content-desc="" checkable="false" checked="false" clickable="false" enabled="true" focusable="false" focused="false" scrollable="false" long-clickable="false" password="false" selected="false" bounds="[0,0][2400,1080]">
+    <node index="0" text="Coffee" resource-id="com.example:id/title" class="android.widget.TextView" package="com.example" content-desc="" checkable="false" checked="false" clickable="true" enabled="true" focusable="true" focused="false" scrollable="false" long-clickable="false" password="false" selected="true" bounds="[-10,40][300,120]" />
+    <node index="1" text="Order" class="android.widget.Button" package="com.example" checked="mixed" clickable="true" enabled="" drawing-order="2" bounds="[300,40][600,120]">
+      <node index="x" class="android.view.View" />
+    </node>
+  </node>
+</hierarchy>
+"""
+
+
+def test_to_dict_matches_parse_ui_dump():
+    tree = UITree.from_xml(DUMP)
+
+    assert tree.to_dict() == parse_ui_dump(DUMP)
+    assert tree.to_dict()["rotation"] == "1"
+    button = tree.node(3)
+    assert tree.extra[3] == {"checked": "mixed", "enabled": "", "drawing-order": "2"}
+    assert not button.has_flag("checked") and not button.has_flag("enabled")
+    assert tree.extra[4] == {"index": "x"}
+
+
+def test_subtree_to_dict_matches_parse_ui_dump():
+    tree = UITree.from_xml(DUMP)
+    parsed = parse_ui_dump(DUMP)["children"][0]
+
+    assert tree.to_dict(1) == parsed
+    assert tree.to_dict(3) == parsed["children"][1]
+
+
+def test_bounds_array():
+    tree = UITree.from_xml(DUMP)
+    bounds = tree.bounds
+
+    assert bounds.shape == (len(tree), 4)
+    assert bounds.dtype == np.int32
+    assert bounds[1].tolist() == [0, 0, 2400, 1080]
+    assert bounds[2].tolist() == [-10, 40, 300, 120]
+    # Nodes without bounds keep a zero row and report None
+    assert bounds[0].tolist() == [0, 0, 0, 0] and tree.bounds_of(0) is None
+    assert tree.bounds_of(4) is None
+    assert tree.bounds is bounds